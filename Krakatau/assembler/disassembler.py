@@ -2,6 +2,7 @@ import collections
 import re
 
 from . import instructions, tokenize, parse, assembler, codes
+from .. import instrument
 from ..binUnpacker import binUnpacker
 from ..classfile import ClassFile
 
@@ -380,7 +381,8 @@ def disMethod(method, add, poolm):
     for name_ind, name, attr in getAttributeTriples(method):
         disMethodAttribute(name_ind, name, binUnpacker(attr), add, poolm)
 
-    disMethodCode(method.code, add, poolm)
+    with instrument.profiled(method):
+        disMethodCode(method.code, add, poolm)
     add('.end method')
 
 def _disEVorAnnotationSub(bytes_, add, poolm, isAnnot, init_prefix, init_indent):
@@ -12,6 +12,7 @@ class Environment(object):
         self.path = []
         #Cache inheritance hierchies of standard lib classes so we don't have to load them to do subclass testing
         self.cache = stdcache.Cache(self, 'cache.txt')
+        self.exceptionSetCache = None #created on demand by ssa.exceptionset
         self._open = {}
 
     def addToPath(self, path):
@@ -10,3 +10,8 @@ class VerificationError(Exception):
     def __init__(self, message, data=None):
         super(VerificationError, self).__init__(message)
         self.data = data
+
+class BudgetExceeded(Exception):
+    def __init__(self, message, phase=None):
+        super(BudgetExceeded, self).__init__(message)
+        self.phase = phase
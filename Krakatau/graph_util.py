@@ -1,48 +1,220 @@
-import itertools
+# The graph algorithms here work on an IndexedGraph, which numbers the nodes reachable from a set of
+# roots densely from 0 and stores the edges as lists of ints. This means the children of each node are
+# only looked up once, and the algorithms use flat lists rather than dicts keyed by arbitrary objects
 
-def tarjanSCC(roots, getChildren):
-    """Return a list of strongly connected components in a graph. If getParents is passed instead of getChildren, the result will be topologically sorted.
+class IndexedGraph(object):
+    def __init__(self, roots, getChildren):
+        self.nodes = nodes = [] #id -> node
+        self.index = index = {} #node -> id
+        self.succs = succs = [] #id -> list of child ids
+        self._preds = None
 
-    roots - list of root nodes to search from
-    getChildren - function which returns children of a given node
-    """
+        for node in roots:
+            if node not in index:
+                index[node] = len(nodes)
+                nodes.append(node)
+        for node in nodes: #nodes grows as new children are found
+            children = []
+            for child in getChildren(node):
+                if child not in index:
+                    index[child] = len(nodes)
+                    nodes.append(child)
+                children.append(index[child])
+            succs.append(children)
+        self.roots = [index[node] for node in roots]
+
+    def predecessors(self):
+        if self._preds is None:
+            self._preds = preds = [[] for _ in self.nodes]
+            for i, children in enumerate(self.succs):
+                for child in children:
+                    preds[child].append(i)
+        return self._preds
+
+    def sccs(self):
+        '''Returns the strongly connected components as tuples of ids, with each component after all those it has edges to'''
+        return _tarjan(self.succs, self.roots, [False]*len(self.nodes))
+
+    def reversePostorder(self):
+        return _reversePostorder(self.succs, self.roots)
+
+    def dominators(self):
+        '''Returns the immediate dominator of each id, for a graph with a single root. The root is its own
+        immediate dominator'''
+        root, = set(self.roots)
+        return _dominators(self.succs, self.predecessors(), root)
+
+    def postDominators(self):
+        '''Returns the immediate post dominator of each id, or None for nodes which are only post dominated
+        by the exit. The exit is a virtual node following every node without children, so nodes which can't
+        reach one (i.e. infinite loops) have no post dominators at all and also get None'''
+        n = len(self.nodes)
+        exits = [i for i, children in enumerate(self.succs) if not children]
+        #Reverse the edges, with the virtual exit as id n
+        succs = self.predecessors() + [exits]
+        preds = [list(children) for children in self.succs] + [[]]
+        for i in exits:
+            preds[i].append(n)
+        ipdom = _dominators(succs, preds, n)[:n]
+        return [(None if x == n else x) for x in ipdom]
 
+    def isReducible(self):
+        '''Returns whether every loop is only entered through its header, for a graph with a single root'''
+        idom = self.dominators()
+        rponum = [0]*len(idom)
+        for i, x in enumerate(self.reversePostorder()):
+            rponum[x] = i
+        #The graph is reducible iff every retreating edge goes to a dominator of its source
+        for x, children in enumerate(self.succs):
+            for child in children:
+                if rponum[child] <= rponum[x]:
+                    y = x
+                    while y != child and y != idom[y]:
+                        y = idom[y]
+                    if y != child:
+                        return False
+        return True
+
+    def loopForest(self):
+        '''Returns the loop headers, outer loops first, and the header of the innermost loop containing each id
+        (excluding the header itself), or None. Loops are found by recursively decomposing the graph into SCCs.
+        The header of each loop is its first node in reverse postorder (for reducible loops, the one which
+        dominates the rest), and the inner loops are the SCCs which remain once the header is removed'''
+        n = len(self.nodes)
+        rponum = [0]*n
+        for i, x in enumerate(self.reversePostorder()):
+            rponum[x] = i
+
+        #The work arrays are shared between the searches, and only the entries for each loop's members
+        #are reset, so that the time is proportional to the total size of the loops rather than n per loop
+        removed, index, lowlink = [True]*n, [-1]*n, [-1]*n
+        headers, parent = [], [None]*n
+        stack = [(None, range(n))]
+        while stack:
+            outer, members = stack.pop()
+            for x in members:
+                removed[x] = False
+            sccs = _tarjan(self.succs, members, removed, index, lowlink)
+            for x in members: #_tarjan already marked them all removed again
+                index[x] = -1
+
+            for scc in sccs:
+                if len(scc) == 1 and scc[0] not in self.succs[scc[0]]:
+                    parent[scc[0]] = outer
+                    continue
+                header = min(scc, key=rponum.__getitem__)
+                headers.append(header)
+                parent[header] = outer
+                stack.append((header, [x for x in scc if x != header]))
+        return headers, parent
+
+def _tarjan(succs, roots, removed, index=None, lowlink=None):
+    #Nodes already marked in removed are ignored. The rest are marked as their components are found
+    #The index and lowlink arrays may be passed in to reuse them, in which case every index must be -1
     sccs = []
-    indexCounter = itertools.count()
-    index = {}
-    lowlink = {}
-    removed = set()
+    if index is None:
+        index, lowlink = [-1]*len(succs), [-1]*len(succs)
+    counter = 0
     subtree = []
 
-    #Use iterative version to avoid stack limits for large datasets
-    stack = [(node,0) for node in roots]
-    while stack:
-        current, state = stack.pop()
-        if state == 0: #before recursing
-            if current not in index: #if it's in index, it was already visited (possibly earlier on the current search stack)
-                lowlink[current] = index[current] = next(indexCounter)
-                children = [child for child in getChildren(current) if child not in removed]
-                subtree.append(current)
-
-                stack.append((current,1))
-                stack.extend((child,0) for child in children)
-        else: #after recursing
-            children = [child for child in getChildren(current) if child not in removed]
+    #Use iterative version to avoid stack limits for large datasets. Children are visited last first
+    for root in reversed(roots):
+        if index[root] >= 0:
+            continue
+        lowlink[root] = index[root] = counter
+        counter += 1
+        subtree.append(root)
+        stack = [(root, reversed(succs[root]))]
+        while stack:
+            current, children = stack[-1]
             for child in children:
-                if index[child] <= index[current]: #backedge (or selfedge)
-                    lowlink[current] = min(lowlink[current], index[child])
-                else:
-                    lowlink[current] = min(lowlink[current], lowlink[child])
-                assert(lowlink[current] <= index[current])
-
-            if index[current] == lowlink[current]:
-                scc = []
-                while not scc or scc[-1] != current:
-                    scc.append(subtree.pop())
-
-                sccs.append(tuple(scc))
-                removed.update(scc)
+                if index[child] < 0 and not removed[child]:
+                    lowlink[child] = index[child] = counter
+                    counter += 1
+                    subtree.append(child)
+                    stack.append((child, reversed(succs[child])))
+                    break
+            else: #after recursing
+                stack.pop()
+                cur = low = index[current]
+                for child in succs[current]:
+                    if not removed[child]:
+                        #backedges (and selfedges) use the index, tree and cross edges the lowlink
+                        x = index[child] if index[child] <= cur else lowlink[child]
+                        if x < low:
+                            low = x
+                lowlink[current] = low
+
+                if low == cur:
+                    scc = []
+                    while not scc or scc[-1] != current:
+                        scc.append(subtree.pop())
+                        removed[scc[-1]] = True
+                    sccs.append(tuple(scc))
     return sccs
+
+def _reversePostorder(succs, roots):
+    seen = [False]*len(succs)
+    order = []
+    for root in roots:
+        if seen[root]:
+            continue
+        seen[root] = True
+        stack = [(root, iter(succs[root]))]
+        while stack:
+            cur, children = stack[-1]
+            for child in children:
+                if not seen[child]:
+                    seen[child] = True
+                    stack.append((child, iter(succs[child])))
+                    break
+            else:
+                stack.pop()
+                order.append(cur)
+    order.reverse()
+    return order
+
+def _dominators(succs, preds, root):
+    #Compute immediate dominators with the algorithm of Cooper, Harvey, and Kennedy
+    #Nodes unreachable from root get None
+    rpo = _reversePostorder(succs, [root])
+    rponum = [-1]*len(succs)
+    for i, x in enumerate(rpo):
+        rponum[x] = i
+    idom = [None]*len(succs)
+    idom[root] = root
+
+    changed = True
+    while changed:
+        changed = False
+        for x in rpo[1:]:
+            new = None
+            for p in preds[x]:
+                if idom[p] is None:
+                    continue
+                if new is None:
+                    new = p
+                    continue
+                a = p
+                while a != new:
+                    while rponum[a] > rponum[new]:
+                        a = idom[a]
+                    while rponum[new] > rponum[a]:
+                        new = idom[new]
+            if idom[x] != new:
+                idom[x] = new
+                changed = True
+    return idom
+
+def tarjanSCC(roots, getChildren):
+    """Return a list of strongly connected components in a graph. If getParents is passed instead of getChildren, the result will be topologically sorted.
+
+    roots - list of root nodes to search from
+    getChildren - function which returns children of a given node
+    """
+    graph = IndexedGraph(roots, getChildren)
+    nodes = graph.nodes
+    return [tuple(nodes[x] for x in scc) for scc in graph.sccs()]
 stronglyConnectedComponents = tarjanSCC
 
 def topologicalSort(roots, getParents):
@@ -67,4 +239,21 @@ def topologicalSort(roots, getParents):
         else: #after recursing
             assert(current in visited)
             results.append(current)
-    return results
\ No newline at end of file
+    return results
+
+def findRoot(parents, node):
+    """Return the root of node in a union-find forest, stored as a dict mapping each non root node to its
+    parent. The path is compressed, so every node on it is left pointing directly at the root."""
+    root = node
+    while root in parents:
+        root = parents[root]
+    while node in parents and parents[node] is not root:
+        parents[node], node = root, parents[node]
+    return root
+
+# Adapters for the two kinds of control flow graph nodes
+def fromSSABlocks(entryBlock):
+    return IndexedGraph([entryBlock], lambda block:block.jump.getSuccessors())
+
+def fromProxies(entryNode):
+    return IndexedGraph([entryNode], lambda node:node.successors)
@@ -0,0 +1,226 @@
+'''Optional instrumentation: per-phase time and memory records as JSON Lines, cProfile hooks and per-method budgets'''
+import collections, contextlib, cProfile, heapq, itertools, json, sys, time
+
+from .error import BudgetExceeded
+
+try:
+    import resource
+except ImportError: #not available on Windows
+    resource = None
+
+def peakMemory():
+    '''Returns the peak resident set size of the process so far in kilobytes, or None if unknown'''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': #reported in bytes rather than kilobytes
+        peak //= 1024
+    return peak
+
+class Recorder(object):
+    def __init__(self, out=None, slowest=0):
+        self.out = out #file for JSON Lines records, if any
+        self.context = {} #names of the class and method currently being processed
+        self.slowest = slowest #number of slowest methods to keep track of
+        self.heap = [] #min heap of (time, tiebreak, info)
+        self.counter = itertools.count()
+        self.method = None #info for the method in progress
+        self.phaseTotals = collections.defaultdict(float) #total time spent in each phase
+
+    def write(self, **fields):
+        if self.out is None:
+            return
+        fields.update(self.context)
+        self.out.write(json.dumps(fields, sort_keys=True) + '\n')
+
+    def addMethod(self, elapsed, info):
+        if not self.slowest:
+            return
+        item = elapsed, next(self.counter), info
+        if len(self.heap) < self.slowest:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def slowestMethods(self):
+        '''Returns the info for the slowest methods seen, slowest first'''
+        return [info for _, _, info in sorted(self.heap, reverse=True)]
+
+    @contextlib.contextmanager
+    def measure(self, event, **fields):
+        #Python 2 has no tracemalloc, so memory is measured by the growth in the process's peak
+        #resident set size. Since the peak never decreases, only phases which set a new high
+        #water mark show any growth
+        startMem, start = peakMemory(), time.time()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed = time.time() - start
+            endMem = peakMemory()
+            growth = None if endMem is None else endMem - startMem
+            if not ok:
+                fields['failed'] = True
+            if event == 'phase':
+                self.phaseTotals[fields['phase']] += elapsed
+            if event == 'phase' and self.method is not None:
+                phases = self.method['phases']
+                phases[fields['phase']] = phases.get(fields['phase'], 0.0) + elapsed
+            elif event == 'method':
+                fields.update(self.method)
+                del fields['phases']
+                self.method['time'] = elapsed
+                self.addMethod(elapsed, self.method)
+            self.write(event=event, time=elapsed, peak_kb=endMem, peak_growth_kb=growth, **fields)
+
+_recorder = None
+
+def start(out=None, slowest=0):
+    '''Start recording. Records are written to the file like object out if given, and the slowest methods are kept'''
+    global _recorder
+    _recorder = Recorder(out, slowest)
+    return _recorder
+
+def stop():
+    global _recorder
+    _recorder = None
+
+def note(**metrics):
+    '''Attach size metrics to the method in progress'''
+    if _recorder is not None and _recorder.method is not None:
+        _recorder.method.update(metrics)
+
+@contextlib.contextmanager
+def phase(name):
+    if _recorder is None and _budget is None:
+        yield
+        return
+    try:
+        if _budget is not None:
+            _budget.enter(name)
+        if _recorder is None:
+            yield
+        else:
+            with _recorder.measure('phase', phase=name):
+                yield
+        checkBudget()
+    finally:
+        if _budget is not None:
+            _budget.phases.pop()
+
+class Budget(object):
+    #Limits on the wall clock time and peak memory growth allowed for each method. Since they can
+    #only be checked cooperatively, at phase boundaries and in the main loops of the slower phases,
+    #a method may overrun slightly before it is stopped
+    def __init__(self, seconds=None, memoryKB=None):
+        self.seconds = seconds
+        self.memoryKB = memoryKB
+        self.deadline = self.memoryLimit = None #only set while a method is in progress
+        self.phases = [] #names of the phases in progress, innermost last
+        self.checks = 0
+
+    def begin(self):
+        if self.seconds is not None:
+            self.deadline = time.time() + self.seconds
+        if self.memoryKB is not None:
+            peak = peakMemory()
+            self.memoryLimit = None if peak is None else peak + self.memoryKB
+
+    def end(self):
+        self.deadline = self.memoryLimit = None
+
+    def enter(self, name):
+        self.phases.append(name)
+        self.check()
+
+    def check(self):
+        phase = self.phases[-1] if self.phases else 'unknown'
+        if self.deadline is not None and time.time() > self.deadline:
+            raise BudgetExceeded('Time limit of {}s exceeded in phase {}'.format(self.seconds, phase), phase)
+        if self.memoryLimit is not None:
+            #getrusage is relatively slow, so only check memory occasionally
+            self.checks += 1
+            if self.checks % 64 == 0 and peakMemory() > self.memoryLimit:
+                raise BudgetExceeded('Memory limit of {} KB exceeded in phase {}'.format(self.memoryKB, phase), phase)
+
+_budget = None
+
+def setBudget(seconds=None, memoryKB=None):
+    '''Limit the time and peak memory growth of each method decompiled. Pass no limits to remove the budget'''
+    global _budget
+    _budget = None if seconds is None and memoryKB is None else Budget(seconds, memoryKB)
+
+def checkBudget():
+    '''Raises BudgetExceeded if the method in progress is over budget'''
+    if _budget is not None:
+        _budget.check()
+
+@contextlib.contextmanager
+def budgeted():
+    '''Enforces the budget, if any, within the block'''
+    if _budget is None:
+        yield
+        return
+    _budget.begin()
+    try:
+        yield
+    finally:
+        _budget.end()
+
+_profiler = None
+_profileMinSize = None
+
+def startProfiling(minCodeSize=None):
+    '''Profile the whole run, or if minCodeSize is given, only methods with at least that many bytes of bytecode'''
+    global _profiler, _profileMinSize
+    _profiler = cProfile.Profile()
+    _profileMinSize = minCodeSize
+    if minCodeSize is None:
+        _profiler.enable()
+
+def isProfiling():
+    return _profiler is not None
+
+def stopProfiling(path):
+    '''Write the collected profile to path in pstats format'''
+    global _profiler
+    _profiler.disable()
+    _profiler.dump_stats(path)
+    _profiler = None
+
+@contextlib.contextmanager
+def profiled(method):
+    #Only needed when profiling selected methods. Otherwise the profiler is already running, if at all
+    code = method.code
+    if _profiler is None or _profileMinSize is None or code is None or code.codelen < _profileMinSize:
+        yield
+        return
+    _profiler.enable()
+    try:
+        yield
+    finally:
+        _profiler.disable()
+
+@contextlib.contextmanager
+def scope(kind, name):
+    '''Records the totals for a 'class' or 'method', and tags the phases recorded within it'''
+    if _recorder is None:
+        yield
+        return
+    context = _recorder.context
+    old = context.get(kind)
+    context[kind] = name
+    if kind == 'method':
+        oldMethod = _recorder.method
+        _recorder.method = {'class':context.get('class'), 'method':name, 'phases':collections.OrderedDict()}
+    try:
+        with _recorder.measure(kind):
+            yield
+    finally:
+        if old is None:
+            del context[kind]
+        else:
+            context[kind] = old
+        if kind == 'method':
+            _recorder.method = oldMethod
@@ -2,9 +2,11 @@ import itertools
 
 from ..ssa import objtypes
 from .stringescape import escapeString
+from .sourcewriter import printToString
 # from ..ssa.constraints import ValueType
 
 class VariableDeclarator(object):
+    __slots__ = 'typename local'.split()
     def __init__(self, typename, identifier): self.typename = typename; self.local = identifier
 
     def print_(self):
@@ -13,21 +15,27 @@ class VariableDeclarator(object):
 #############################################################################################################################################
 
 class JavaStatement(object):
+    __slots__ = ()
     expr = None #provide default for subclasses that don't have an expression
     def getScopes(self): return ()
 
+    #Compound statements override write and print_ via the SourceWriter, simple ones just print_
+    def write(self, out): out.write(self.print_())
+
     def addCastsAndParens(self, env):
         if self.expr is not None:
             self.expr.addCasts(env)
             self.expr.addParens()
 
 class ExpressionStatement(JavaStatement):
+    __slots__ = 'expr'.split()
     def __init__(self, expr):
         self.expr = expr
 
     def print_(self): return self.expr.print_() + ';'
 
 class LocalDeclarationStatement(JavaStatement):
+    __slots__ = 'decl expr'.split()
     def __init__(self, decl, expr=None):
         self.decl = decl
         self.expr = expr
@@ -46,6 +54,7 @@ class LocalDeclarationStatement(JavaStatement):
             self.expr.addParens()
 
 class ReturnStatement(JavaStatement):
+    __slots__ = 'expr tt'.split()
     def __init__(self, expr=None, tt=None):
         self.expr = expr
         self.tt = tt
@@ -60,11 +69,13 @@ class ReturnStatement(JavaStatement):
             self.expr.addParens()
 
 class ThrowStatement(JavaStatement):
+    __slots__ = 'expr'.split()
     def __init__(self, expr):
         self.expr = expr
     def print_(self): return 'throw {};'.format(self.expr.print_())
 
 class JumpStatement(JavaStatement):
+    __slots__ = 'str'.split()
     def __init__(self, target, isFront):
         keyword = 'continue' if isFront else 'break'
         label = (' ' + target.getLabel()) if target is not None else ''
@@ -75,6 +86,7 @@ class JumpStatement(JavaStatement):
 #Compound Statements
 sbcount = itertools.count()
 class LazyLabelBase(JavaStatement):
+    __slots__ = 'label func continueKey breakKey'.split()
     # Jumps are represented by arbitrary 'keys', currently just the key of the
     # original proxy node. Each item has a continueKey and a breakKey representing
     # the beginning and the point just past the end respectively. breakKey may be
@@ -103,18 +115,26 @@ class LazyLabelBase(JavaStatement):
     __repr__ = __str__
 
 class TryStatement(LazyLabelBase):
+    __slots__ = 'tryb pairs'.split()
     def __init__(self, labelfunc, begink, endk, tryb, pairs):
         super(TryStatement, self).__init__(labelfunc, begink, endk)
         self.tryb, self.pairs = tryb, pairs
 
     def getScopes(self): return (self.tryb,) + zip(*self.pairs)[1]
 
-    def print_(self):
-        tryb = self.tryb.print_()
-        parts = ['catch({})\n{}'.format(x.print_(), y.print_()) for x,y in self.pairs]
-        return '{}try\n{}\n{}'.format(self.getLabelPrefix(), tryb, '\n'.join(parts))
+    def write(self, out):
+        out.write(self.getLabelPrefix() + 'try\n')
+        self.tryb.write(out)
+        out.write('\n')
+        for i, (x, y) in enumerate(self.pairs):
+            if i:
+                out.write('\n')
+            out.write('catch({})\n'.format(x.print_()))
+            y.write(out)
+    print_ = printToString
 
 class IfStatement(LazyLabelBase):
+    __slots__ = 'expr scopes'.split()
     def __init__(self, labelfunc, begink, endk, expr, scopes):
         super(IfStatement, self).__init__(labelfunc, begink, endk)
         self.expr = expr #don't rename without changing how var replacement works!
@@ -123,25 +143,25 @@ class IfStatement(LazyLabelBase):
 
     def getScopes(self): return self.scopes
 
-    def print_(self):
-        lbl = self.getLabelPrefix()
-        parts = [self.expr] + list(self.scopes)
-
+    def write(self, out):
+        out.write('{}if({})\n'.format(self.getLabelPrefix(), self.expr.print_()))
+        self.scopes[0].write(out)
         if len(self.scopes) == 1:
-            parts = [x.print_() for x in parts]
-            return '{}if({})\n{}'.format(lbl, *parts)
+            return
 
         # Special case handling for 'else if'
         sep = '\n' #else seperator depends on if we have else if
-        fblock = self.scopes[1]
+        last = fblock = self.scopes[1]
         if len(fblock.statements) == 1:
             stmt = fblock.statements[-1]
             if isinstance(stmt, IfStatement) and stmt.label is None:
-                sep, parts[-1] = ' ', stmt
-        parts = [x.print_() for x in parts]
-        return '{}if({})\n{}\nelse{sep}{}'.format(lbl, *parts, sep=sep)
+                sep, last = ' ', stmt
+        out.write('\nelse' + sep)
+        last.write(out)
+    print_ = printToString
 
 class SwitchStatement(LazyLabelBase):
+    __slots__ = 'expr pairs'.split()
     def __init__(self, labelfunc, begink, endk, expr, pairs):
         super(SwitchStatement, self).__init__(labelfunc, begink, endk)
         self.expr = expr #don't rename without changing how var replacement works!
@@ -150,24 +170,29 @@ class SwitchStatement(LazyLabelBase):
     def getScopes(self): return zip(*self.pairs)[1]
     def hasDefault(self): return None in zip(*self.pairs)[0]
 
-    def print_(self):
-        expr = self.expr.print_()
-
+    def write(self, out):
         def printCase(keys):
             if keys is None:
                 return 'default: '
             return ''.join(map('case {}: '.format, sorted(keys)))
 
-        bodies = [(printCase(keys) + scope.print_()) for keys, scope in self.pairs]
-        if self.pairs[-1][0] is None and len(self.pairs[-1][1].statements) == 0:
-            bodies.pop()
-
-        contents = '\n'.join(bodies)
-        indented = ['    '+line for line in contents.splitlines()]
-        lines = ['{'] + indented + ['}']
-        return '{}switch({}){}'.format(self.getLabelPrefix(), expr, '\n'.join(lines))
+        pairs = self.pairs
+        if pairs[-1][0] is None and len(pairs[-1][1].statements) == 0:
+            pairs = pairs[:-1]
+
+        out.write('{}switch({}){{'.format(self.getLabelPrefix(), self.expr.print_()))
+        out.indent()
+        for i, (keys, scope) in enumerate(pairs):
+            if i:
+                out.write('\n')
+            out.write(printCase(keys))
+            scope.write(out)
+        out.dedent()
+        out.write('}')
+    print_ = printToString
 
 class WhileStatement(LazyLabelBase):
+    __slots__ = 'expr parts'.split()
     def __init__(self, labelfunc, begink, endk, parts):
         super(WhileStatement, self).__init__(labelfunc, begink, endk)
         self.expr = Literal.TRUE
@@ -176,11 +201,13 @@ class WhileStatement(LazyLabelBase):
 
     def getScopes(self): return self.parts
 
-    def print_(self):
-        parts = self.expr.print_(), self.parts[0].print_()
-        return '{}while({})\n{}'.format(self.getLabelPrefix(), *parts)
+    def write(self, out):
+        out.write('{}while({})\n'.format(self.getLabelPrefix(), self.expr.print_()))
+        self.parts[0].write(out)
+    print_ = printToString
 
 class StatementBlock(LazyLabelBase):
+    __slots__ = 'parent statements jumpKey labelable bases'.split()
     def __init__(self, labelfunc, begink, endk, statements, jumpk, labelable=True):
         super(StatementBlock, self).__init__(labelfunc, begink, endk)
         self.parent = None #should be assigned later
@@ -192,13 +219,17 @@ class StatementBlock(LazyLabelBase):
 
     def getScopes(self): return self,
 
-    def print_(self):
+    def write(self, out):
         assert(self.labelable or self.label is None)
-        contents = '\n'.join(x.print_() for x in self.statements)
-        indented = ['    '+line for line in contents.splitlines()]
-        # indented[:0] = ['    //{}{}'.format(self,x) for x in (self.breakKey, self.continueKey, self.jumpKey)]
-        lines = [self.getLabelPrefix() + '{'] + indented + ['}']
-        return '\n'.join(lines)
+        out.write(self.getLabelPrefix() + '{')
+        out.indent()
+        for i, x in enumerate(self.statements):
+            if i:
+                out.write('\n')
+            x.write(out)
+        out.dedent()
+        out.write('}')
+    print_ = printToString
 
     @staticmethod
     def join(*scopes):
@@ -210,6 +241,7 @@ class StatementBlock(LazyLabelBase):
 
 #Temporary hack
 class StringStatement(JavaStatement):
+    __slots__ = 's'.split()
     def __init__(self, s):
         self.s = s
     def print_(self): return self.s
@@ -268,13 +300,19 @@ def makeCastExpr(newtt, expr, fixEnv=None):
 # Associativity: L = Left, R = Right, A = Full
 
 class JavaExpression(object):
+    #Subclasses all declare a params slot, since the passes reassign it, so they must set it themselves
+    __slots__ = ()
     precedence = 0 #Default precedence
-    params = () #for subclasses that don't have params
 
     def complexity(self): return 1 + max(e.complexity() for e in self.params) if self.params else 0
 
     def postFlatIter(self):
-        return itertools.chain([self], *[expr.postFlatIter() for expr in self.params])
+        #Iterative, since chaining nested generators is quadratic for deeply nested expressions
+        stack = [self]
+        while stack:
+            expr = stack.pop()
+            yield expr
+            stack.extend(reversed(expr.params))
 
     def print_(self):
         return self.fmt.format(*[expr.print_() for expr in self.params])
@@ -307,6 +345,7 @@ class JavaExpression(object):
     __str__ = __repr__
 
 class ArrayAccess(JavaExpression):
+    __slots__ = 'params fmt'.split()
     def __init__(self, *params):
         if params[0].dtype == objtypes.NullTT:
             #Unfortunately, Java doesn't really support array access on null constants
@@ -329,6 +368,7 @@ class ArrayAccess(JavaExpression):
             self.params[0] = Parenthesis(p0)
 
 class ArrayCreation(JavaExpression):
+    __slots__ = 'params dtype fmt'.split()
     def __init__(self, tt, *sizeargs):
         base, dim = tt
         self.params = (TypeName((base,0)),) + sizeargs
@@ -337,6 +377,7 @@ class ArrayCreation(JavaExpression):
         self.fmt = 'new {}' + '[{}]'*len(sizeargs) + '[]'*(dim-len(sizeargs))
 
 class Assignment(JavaExpression):
+    __slots__ = 'params fmt'.split()
     precedence = 21
     def __init__(self, *params):
         self.params = params
@@ -361,6 +402,7 @@ for _ops, _val in zip(_binary_ptable, range(10,20)):
         binary_precedences[_op] = _val
 
 class BinaryInfix(JavaExpression):
+    __slots__ = 'params opstr fmt _dtype precedence'.split()
     def __init__(self, opstr, params, dtype=None):
         assert(len(params) == 2)
         self.params = params
@@ -383,6 +425,7 @@ class BinaryInfix(JavaExpression):
                 self.params[i] = Parenthesis(p)
 
 class Cast(JavaExpression):
+    __slots__ = 'dtype params fmt'.split()
     precedence = 5
     def __init__(self, *params):
         self.dtype = params[0].tt
@@ -407,6 +450,7 @@ class Cast(JavaExpression):
             self.params[1] = Parenthesis(p1)
 
 class ClassInstanceCreation(JavaExpression):
+    __slots__ = 'typename tts params dtype'.split()
     def __init__(self, typename, tts, arguments):
         self.typename, self.tts, self.params = typename, tts, arguments
         self.dtype = typename.tt
@@ -423,6 +467,7 @@ class ClassInstanceCreation(JavaExpression):
         self.params = newparams
 
 class FieldAccess(JavaExpression):
+    __slots__ = 'dtype params name fmt'.split()
     def __init__(self, primary, name, dtype, printLeft=True):
         self.dtype = dtype
         self.params, self.name = [primary], escapeString(name)
@@ -446,9 +491,11 @@ def printFloat(x, isSingle):
     return repr(x) + suffix
 
 class Literal(JavaExpression):
+    __slots__ = 'dtype val str params fmt'.split()
     def __init__(self, vartype, val):
         self.dtype = vartype
         self.val = val
+        self.params = ()
 
         self.str = None
         if vartype == objtypes.StringTT:
@@ -494,10 +541,12 @@ Literal.DZERO = Literal(objtypes.DoubleTT, 0.0)
 Literal.NULL = Literal(objtypes.NullTT, None)
 
 class Local(JavaExpression):
+    __slots__ = 'dtype name func params'.split()
     def __init__(self, vartype, namefunc):
         self.dtype = vartype
         self.name = None
         self.func = namefunc
+        self.params = ()
 
     def print_(self):
         if self.name is None:
@@ -505,6 +554,7 @@ class Local(JavaExpression):
         return self.name
 
 class MethodInvocation(JavaExpression):
+    __slots__ = 'params hasLeft dtype name tts op'.split()
     def __init__(self, left, name, tts, arguments, op, dtype):
         if left is None:
             self.params = arguments
@@ -539,6 +589,7 @@ class MethodInvocation(JavaExpression):
                 self.params[0] = Parenthesis(p0)
 
 class Parenthesis(JavaExpression):
+    __slots__ = 'params fmt'.split()
     def __init__(self, param):
         self.params = param,
         self.fmt = '({})'
@@ -547,6 +598,7 @@ class Parenthesis(JavaExpression):
     def dtype(self): return self.params[0].dtype
 
 class Ternary(JavaExpression):
+    __slots__ = 'params fmt'.split()
     precedence = 20
     def __init__(self, *params):
         self.params = params
@@ -557,15 +609,20 @@ class Ternary(JavaExpression):
 
     def addParens_sub(self):
         #Add unecessary parenthesis to complex conditions for readability
-        if self.params[0].precedence >= 20 or self.params[0].complexity() > 0:
+        #Note: complexity() > 0 iff there is a param other than a TypeName, so we check that directly
+        #rather than recursing over the whole condition
+        cond = self.params[0]
+        if cond.precedence >= 20 or any(not isinstance(p, TypeName) for p in cond.params):
             self.params[0] = Parenthesis(self.params[0])
         if self.params[2].precedence > 20:
             self.params[2] = Parenthesis(self.params[2])
 
 class TypeName(JavaExpression):
+    __slots__ = 'dtype tt str params'.split()
     def __init__(self, tt):
         self.dtype = None
         self.tt = tt
+        self.params = ()
         name, dim = tt
         if name[0] == '.': #primative type:
             name = name[1:]
@@ -580,15 +637,18 @@ class TypeName(JavaExpression):
     def complexity(self): return -1 #exprs which have this as a param won't be bumped up to 1 uncessarily
 
 class CatchTypeNames(JavaExpression): #Used for caught exceptions, which can have multiple types specified
+    __slots__ = 'tnames dtype params'.split()
     def __init__(self, env, tts):
         assert(tts and not any(zip(*tts)[1])) #at least one type, no array types
         self.tnames = map(TypeName, tts)
         self.dtype = objtypes.commonSupertype(env, tts)
+        self.params = ()
 
     def print_(self):
         return ' | '.join(tn.print_() for tn in self.tnames)
 
 class UnaryPrefix(JavaExpression):
+    __slots__ = 'params opstr fmt _dtype'.split()
     precedence = 5
     def __init__(self, opstr, param, dtype=None):
         self.params = [param]
@@ -606,6 +666,7 @@ class UnaryPrefix(JavaExpression):
 
 
 class Dummy(JavaExpression):
+    __slots__ = 'params fmt isNew dtype'.split()
     def __init__(self, fmt, params, isNew=False):
         self.params = params
         self.fmt = fmt
@@ -1,5 +1,6 @@
 from . import ast
 from .stringescape import escapeString as escape
+from .sourcewriter import printToString
 
 class MethodDef(object):
     def __init__(self, class_, flags, name, retType, paramDecls, body):
@@ -17,7 +18,7 @@ class MethodDef(object):
             self.isStaticInit, self.isConstructor = False, False
             self.name = escape(name)
 
-    def print_(self):
+    def write(self, out):
         argstr = ', '.join(decl.print_() for decl in self.paramDecls)
         if self.isStaticInit:
             header = 'static'
@@ -31,9 +32,11 @@ class MethodDef(object):
             header = '//{}\n{}'.format(self.comment, header)
 
         if self.body is None:
-            return header + ';\n'
+            out.write(header + ';\n')
         else:
-            return header + '\n' + self.body.print_()
+            out.write(header + '\n')
+            self.body.write(out)
+    print_ = printToString
 
 class FieldDef(object):
     def __init__(self, flags, type_, name, expr=None):
@@ -59,16 +62,7 @@ class ClassDef(object):
         if superc == 'java/lang/Object':
             self.super = None
 
-    def print_(self):
-        contents = ''
-        if self.fields:
-            contents = '\n'.join(x.print_() for x in self.fields)
-        if self.methods:
-            if contents:
-                contents += '\n\n' #extra line to divide fields and methods
-            contents += '\n\n'.join(x.print_() for x in self.methods)
-
-        indented = ['    '+line for line in contents.splitlines()]
+    def write(self, out):
         name = self.name.print_().rpartition('.')[-1]
         defname = 'interface' if self.isInterface else 'class'
         header = '{}{} {}'.format(self.flagstr, defname, name)
@@ -82,5 +76,19 @@ class ClassDef(object):
             else:
                 header += ' implements ' + ', '.join(x.print_() for x in self.interfaces)
 
-        lines = [header + ' {'] + indented + ['}']
-        return '\n'.join(lines)
\ No newline at end of file
+        out.write(header + ' {')
+        out.indent()
+        for i, x in enumerate(self.fields):
+            if i:
+                out.write('\n')
+            out.write(x.print_())
+        if self.methods:
+            if self.fields:
+                out.write('\n\n') #extra line to divide fields and methods
+            for i, x in enumerate(self.methods):
+                if i:
+                    out.write('\n\n')
+                x.write(out)
+        out.dedent()
+        out.write('}')
+    print_ = printToString
\ No newline at end of file
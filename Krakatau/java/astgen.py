@@ -170,6 +170,28 @@ def _convertJExpr(op, getExpr, clsname):
     return ast.ExpressionStatement(expr)
 
 #########################################################################################
+def _parallelAssigns(info, pairs):
+    #The assignments along an edge happen simultaneously, so order them such that no variable is
+    #overwritten while another assignment still needs its old value, using temporaries for cycles
+    pending = [(left, right) for left, right in pairs if left != right]
+    statements = []
+    while pending:
+        reads = set()
+        for left, right in pending:
+            reads.update(right.postFlatIter())
+
+        ready = [t for t in pending if t[0] not in reads]
+        if not ready:
+            left = pending[0][0]
+            temp = info.customVar(left.dtype, _prefix_map.get(left.dtype, 'a'))
+            statements.append(ast.ExpressionStatement(ast.Assignment(temp, left)))
+            pending = [(l, r.replaceSubExprs({left:temp})) for l, r in pending]
+            continue
+        for left, right in ready:
+            statements.append(ast.ExpressionStatement(ast.Assignment(left, right)))
+        pending = [t for t in pending if t not in ready]
+    return statements
+
 def _createASTBlock(info, endk, node):
     getExpr = lambda var: info.var(node, var)
     op2expr = lambda op: _convertJExpr(op, getExpr, info.clsname)
@@ -195,19 +217,12 @@ def _createASTBlock(info, endk, node):
     for n2 in node.successors:
         assert((n2 in node.outvars) != (n2 in node.eassigns))
         if n2 in node.eassigns:
-            for outv, inv in zip(node.eassigns[n2], n2.invars):
-                if outv is None: #this is how we mark the thrown exception, which
-                    #obviously doesn't get an explicit assignment statement
-                    continue
-                expr = ast.Assignment(info.var(n2, inv), info.var(node, outv))
-                if expr.params[0] != expr.params[1]:
-                    eassigns.append(ast.ExpressionStatement(expr))
+            #outv of None is how we mark the thrown exception, which obviously doesn't get an explicit assignment statement
+            pairs = [(info.var(n2, inv), info.var(node, outv)) for outv, inv in zip(node.eassigns[n2], n2.invars) if outv is not None]
+            eassigns += _parallelAssigns(info, pairs)
         else:
-            for outv, inv in zip(node.outvars[n2], n2.invars):
-                right = outreplace.get(outv, info.var(node, outv))
-                expr = ast.Assignment(info.var(n2, inv), right)
-                if expr.params[0] != expr.params[1]:
-                    nassigns.append(ast.ExpressionStatement(expr))
+            pairs = [(info.var(n2, inv), outreplace.get(outv, info.var(node, outv))) for outv, inv in zip(node.outvars[n2], n2.invars)]
+            nassigns += _parallelAssigns(info, pairs)
 
     #Need to put exception assignments before last statement, which might throw
     #While normal assignments must come last as they may depend on it
@@ -10,6 +10,9 @@ def unique(seq): return len(set(seq)) == len(seq)
 # but assumes that the underlying variables and statements are immutable
 
 class BlockProxy(object):
+    __slots__ = '''bkey num counter block predecessors successors outvars eassigns _key invars blockdict
+        predecessors_nl successors_nl norm_suc_nl'''.split()
+
     def __init__(self, key, counter, block=None):
         self.bkey = key
         self.num = next(counter)
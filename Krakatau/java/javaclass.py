@@ -1,5 +1,7 @@
 import struct
 
+from .. import instrument
+from ..error import BudgetExceeded
 from ..ssa import objtypes
 from ..verifier.descriptors import parseFieldDescriptor
 
@@ -35,20 +37,31 @@ def _getField(field):
     return ast2.FieldDef(' '.join(flags), ast.TypeName(dtype), field.name, initexpr)
 
 def _getMethod(method, cb, forbidden_identifiers):
+    with instrument.scope('method', method.name + method.descriptor), instrument.profiled(method):
+        return _getMethodSub(method, cb, forbidden_identifiers)
+
+def _getMethodSub(method, cb, forbidden_identifiers):
+    if method.code is not None:
+        instrument.note(codelen=method.code.codelen, handlers=len(method.code.except_raw))
     try:
-        graph = cb(method) if method.code is not None else None
-        print 'Decompiling method', method.name.encode('utf8'), method.descriptor.encode('utf8')
-        code_ast = javamethod.generateAST(method, graph, forbidden_identifiers)
-        return code_ast
+        with instrument.budgeted():
+            graph = cb(method) if method.code is not None else None
+            print 'Decompiling method', method.name.encode('utf8'), method.descriptor.encode('utf8')
+            code_ast = javamethod.generateAST(method, graph, forbidden_identifiers)
+            return code_ast
     except Exception as e:
-        if not IGNORE_EXCEPTIONS:
+        #Methods which run over budget are always replaced by stubs, so the rest of the class can still be decompiled
+        overBudget = isinstance(e, BudgetExceeded)
+        if not IGNORE_EXCEPTIONS and not overBudget:
             raise
         if e.__class__.__name__ == 'DecompilationError':
             print 'Unable to decompile ' + method.class_.name
+        elif overBudget:
+            print 'Decompiling {}.{} stopped: {}'.format(method.class_.name, method.name.encode('utf8'), e)
         else:
             print 'Decompiling {} failed!'.format(method.class_.name)
         code_ast = javamethod.generateAST(method, None, forbidden_identifiers)
-        code_ast.comment = ' {0!r}: {0!s}'.format(e)
+        code_ast.comment = (' ' + str(e)) if overBudget else ' {0!r}: {0!s}'.format(e)
         return code_ast
 
 def generateAST(cls, cb, method=None):
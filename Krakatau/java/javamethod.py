@@ -3,7 +3,7 @@ import operator
 from functools import partial
 
 from ..ssa import objtypes
-from .. import graph_util
+from .. import graph_util, instrument
 from ..namegen import NameGen, LabelGen
 from ..verifier.descriptors import parseMethodDescriptor
 
@@ -109,7 +109,8 @@ def mayBreakTo(root, forbidden):
                         assert(sub.breakKey == last.breakKey == scope.jumpKey)
     return False
 
-def replaceKeys(top, replace):
+def replaceKeys(top, replace, dirty=None):
+    #If dirty is passed, blocks whose jump key changes are added to it
     assert(None not in replace)
     get = lambda k:replace.get(k,k)
 
@@ -121,19 +122,23 @@ def replaceKeys(top, replace):
 
         top.breakKey = get(top.breakKey)
         if isinstance(top, ast.StatementBlock):
+            if dirty is not None and get(top.jumpKey) != top.jumpKey:
+                dirty.add(top)
             top.jumpKey = get(top.jumpKey)
             for item in top.statements:
-                replaceKeys(item, replace)
+                replaceKeys(item, replace, dirty)
         else:
             for scope in top.getScopes():
-                replaceKeys(scope, replace)
+                replaceKeys(scope, replace, dirty)
 
 NONE_SET = frozenset([None])
-def _preorder(scope, func):
+def _preorder(scope, func, visit=None):
+    #If visit is passed, only scopes in it are processed
     newitems = []
     for i, item in enumerate(scope.statements):
         for sub in item.getScopes():
-            _preorder(sub, func)
+            if visit is None or sub in visit:
+                _preorder(sub, func, visit)
 
         val = func(scope, item)
         vals = [item] if val is None else val
@@ -205,7 +210,7 @@ def _pruneIfElse_cb(item):
 
     return item
 
-def _whileCondition_cb(item):
+def _whileCondition_cb(item, dirty=None):
     '''Convert while(true) {if(A) {B break;} else {C} D} to while(!A) {{C} D} {B}'''
     failure = [], item #what to return if we didn't inline
     body = item.getScopes()[0]
@@ -242,6 +247,8 @@ def _whileCondition_cb(item):
             return failure
 
     #Now inline everything
+    if dirty is not None:
+        dirty.add(body)
     item.expr = _simplifyExpressions(ast.BinaryInfix('&&', [item.expr, reverseBoolExpr(cond)]))
     if falseb is None:
         body.statements.pop(0)
@@ -261,17 +268,17 @@ def _whileCondition_cb(item):
     #Trueb doesn't break to head.bkey but there might be unreacahble jumps, so we replace
     #it too. We don't replace item.ckey because it should never appear, even as an
     #unreachable jump
-    replaceKeys(trueb, {head.breakKey:trueb.breakKey, item.breakKey:trueb.breakKey})
+    replaceKeys(trueb, {head.breakKey:trueb.breakKey, item.breakKey:trueb.breakKey}, dirty)
     return [item], trueb
 
-def _simplifyBlocksSub(scope, item, isLast):
+def _simplifyBlocksSub(scope, item, isLast, dirty=None):
     rest = []
     if isinstance(item, ast.TryStatement):
         item = _pruneRethrow_cb(item)
     elif isinstance(item, ast.IfStatement):
         item = _pruneIfElse_cb(item)
     elif isinstance(item, ast.WhileStatement):
-        rest, item = _whileCondition_cb(item)
+        rest, item = _whileCondition_cb(item, dirty)
 
     if isinstance(item, ast.StatementBlock):
         assert(item.breakKey is not None or item.jumpKey is None)
@@ -294,20 +301,29 @@ def _simplifyBlocksSub(scope, item, isLast):
             return rest
     return rest + [item]
 
-def _simplifyBlocks(scope):
+def _simplifyBlocks(scope, dirty=None):
+    #If dirty is passed, scopes which are changed are added to it
     newitems = []
+    oldjump = scope.jumpKey
     for item in reversed(scope.statements):
         isLast = not newitems #may be true if all subsequent items pruned
         if isLast and item.getScopes():
             if item.breakKey != scope.jumpKey:# and item.breakKey is not None:
                 # print 'sib replace', scope, item, item.breakKey, scope.jumpKey
-                replaceKeys(item, {item.breakKey: scope.jumpKey})
+                replaceKeys(item, {item.breakKey: scope.jumpKey}, dirty)
 
         for sub in reversed(item.getScopes()):
-            _simplifyBlocks(sub)
-        vals = _simplifyBlocksSub(scope, item, isLast)
+            _simplifyBlocks(sub, dirty)
+        old = item.expr, item.getScopes()
+        vals = _simplifyBlocksSub(scope, item, isLast, dirty)
+        if dirty is not None and (vals != [item] or item.expr is not old[0] or item.getScopes() != old[1]):
+            #blocks may have had statements moved out of them too
+            dirty.add(scope)
+            dirty.update(x for x in vals if isinstance(x, ast.StatementBlock))
         newitems += reversed(vals)
     scope.statements = newitems[::-1]
+    if dirty is not None and scope.jumpKey != oldjump:
+        dirty.add(scope)
 
 _op2bits = {'==':2, '!=':13, '<':1, '<=':3, '>':4, '>=':6}
 _bit2ops_float = {v:k for k,v in _op2bits.items()}
@@ -453,6 +469,8 @@ def _replaceExpressions(scope, item, rdict):
     return [item]
 
 def _mergeVariables(root, predeclared):
+    #Returns the map of variable replacements. The caller is responsible for applying it
+    #with _replaceExpressions, so that it can be fused with other preorder passes
     _setScopeParents(root)
     info = findVarDeclInfo(root, predeclared)
 
@@ -490,7 +508,7 @@ def _mergeVariables(root, predeclared):
             varmap[var] = var
             if len(info[var].defs) > 1:
                 forbidden.add(var)
-    _preorder(root, partial(_replaceExpressions, rdict=varmap))
+    return varmap
 
 _oktypes = ast.BinaryInfix, ast.Local, ast.Literal, ast.Parenthesis, ast.Ternary, ast.TypeName, ast.UnaryPrefix
 def hasSideEffects(expr):
@@ -504,28 +522,81 @@ def hasSideEffects(expr):
                 return True
     return False
 
-def _inlineVariables(root):
-    #first find all variables with a single def and use
-    defs = collections.defaultdict(list)
-    uses = collections.defaultdict(int)
+#Set to check the incrementally updated use/def index against a full rebuild after every refresh.
+#Useful for debugging
+CHECK_INDEX = 0
 
-    def visitExprFindDefs(expr):
-        if expr.isLocalAssign():
-            defs[expr.params[0]].append(expr)
-        elif isinstance(expr, ast.Local):
-            uses[expr] += 1
-
-    def visitFindDefs(scope, item):
-        if item.expr is not None:
-            stack = [item.expr]
-            while stack:
-                expr = stack.pop()
-                visitExprFindDefs(expr)
-                stack.extend(expr.params)
-
-    _preorder(root, visitFindDefs)
+class _UseDefIndex(object):
+    '''Defs and uses of local variables, recorded per scope so that it can be updated incrementally'''
+    #Everything is kept in insertion order, so that the order of inlining doesn't depend on hashes
+    def __init__(self):
+        self.records = collections.OrderedDict()
+        self.defs = collections.OrderedDict() #var -> [(scope, assignment)]
+        self.uses = collections.OrderedDict() #var -> count
+
+    def _add(self, scope):
+        defs = collections.OrderedDict()
+        uses = collections.OrderedDict()
+        for item in scope.statements:
+            if item.expr is not None:
+                stack = [item.expr]
+                while stack:
+                    expr = stack.pop()
+                    if expr.isLocalAssign():
+                        defs.setdefault(expr.params[0], []).append(expr)
+                    elif isinstance(expr, ast.Local):
+                        uses[expr] = uses.get(expr, 0) + 1
+                    stack.extend(expr.params)
+
+        self.records[scope] = defs, uses
+        for var, exprs in defs.items():
+            self.defs.setdefault(var, []).extend((scope, expr) for expr in exprs)
+        for var, count in uses.items():
+            self.uses[var] = self.uses.get(var, 0) + count
+
+    def _remove(self, scope):
+        defs, uses = self.records.pop(scope)
+        for var in defs:
+            self.defs[var] = [pair for pair in self.defs[var] if pair[0] is not scope]
+        for var, count in uses.items():
+            self.uses[var] -= count
+
+    def refresh(self, root, dirty=()):
+        #Reindex scopes which are new or dirty and drop those no longer in the tree
+        #Only the expressions of a scope's direct statements are recorded for it, so
+        #the caller must mark every scope where these may have changed as dirty
+        live = list(getSubscopeIter(root))
+        liveset = set(live)
+        for scope in self.records.keys():
+            if scope in dirty or scope not in liveset:
+                self._remove(scope)
+        for scope in live:
+            if scope not in self.records:
+                self._add(scope)
+        if CHECK_INDEX:
+            self.check(live)
+
+    def _contents(self):
+        defs = {var:set(pairs) for var, pairs in self.defs.items() if pairs}
+        uses = {var:count for var, count in self.uses.items() if count}
+        return defs, uses
+
+    def check(self, live):
+        fresh = _UseDefIndex()
+        for scope in live:
+            fresh._add(scope)
+        assert(self._contents() == fresh._contents())
+
+def _inlineVariables(root, index, dirty=None):
+    #Note: the index is not updated here, so changed scopes must be passed to the next refresh
+    #first find all variables with a single def and use
     #These should have 2 uses since the initial assignment also counts
-    replacevars = {k for k,v in defs.items() if len(v)==1 and uses[k]==2 and k.dtype == v[0].params[1].dtype}
+    replacevars = set()
+    scopes = collections.OrderedDict() #used as an ordered set
+    for var, defs in index.defs.items():
+        if len(defs) == 1 and index.uses.get(var, 0) == 2 and var.dtype == defs[0][1].params[1].dtype:
+            replacevars.add(var)
+            scopes[defs[0][0]] = None
     def doReplacement(item, pairs):
         old, new = item.expr.params
         assert(isinstance(old, ast.Local) and old.dtype == new.dtype)
@@ -574,12 +645,10 @@ def _inlineVariables(root):
                     return False
         return False
 
-    def visitReplace(scope):
+    #Replacements only affect the scope of the def, so other scopes can be skipped
+    for scope in scopes:
         newstatements = []
         for item in reversed(scope.statements):
-            for sub in item.getScopes():
-                visitReplace(sub)
-
             if isinstance(item.expr, ast.Assignment) and item.expr.params[0] in replacevars:
                 expr_roots = []
                 for item2 in newstatements:
@@ -590,10 +659,11 @@ def _inlineVariables(root):
                         break
                 success = doReplacement(item, expr_roots)
                 if success:
+                    if dirty is not None:
+                        dirty.add(scope)
                     continue
             newstatements.insert(0, item)
         scope.statements = newstatements
-    visitReplace(root)
 
 def _createDeclarations(root, predeclared):
     _setScopeParents(root)
@@ -727,6 +797,73 @@ def _generateJumps(scope, targets=collections.OrderedDict(), fallthroughs=NONE_S
                 fallthroughs = frozenset([None, subscope.continueKey])
         fallthroughs = frozenset([None, item.continueKey])
 
+def _dirtyPaths(scope, dirty, result):
+    #Adds the scopes which are dirty or contain a dirty scope to result
+    found = scope in dirty
+    for item in scope.statements:
+        for sub in item.getScopes():
+            found = _dirtyPaths(sub, dirty, result) or found
+    if found:
+        result.add(scope)
+    return found
+
+def _fusePreorder(funcs):
+    def fused(scope, item):
+        items = [item]
+        for func in funcs:
+            newitems = []
+            for item in items:
+                val = func(scope, item)
+                newitems.extend([item] if val is None else val)
+            items = newitems
+        return items
+    return fused
+
+class _PassManager(object):
+    '''Runs the AST passes for a method, fusing consecutive preorder passes into one traversal'''
+    def __init__(self, root):
+        self.root = root
+        self.pending = []
+        self.dirty = None
+
+    def _timed(self, name, func, *args, **kwargs):
+        #Times are recorded with the other phases, if instrumentation is on
+        with instrument.phase(name):
+            return func(*args, **kwargs)
+
+    def flush(self):
+        if self.pending:
+            names, funcs = zip(*self.pending)
+            self.pending = []
+            self._timed('+'.join(names), _preorder, self.root, _fusePreorder(funcs))
+
+    def preorder(self, name, func):
+        #Note: when fused, later callbacks are not applied to the contents of any new compound
+        #statements returned by earlier ones, so only the last callback may create them
+        self.pending.append((name, func))
+
+    def run(self, name, func, *args, **kwargs):
+        self.flush()
+        return self._timed(name, func, self.root, *args, **kwargs)
+
+    def track(self):
+        #Start recording changed scopes so a later preorderDirty can skip unchanged subtrees
+        self.flush()
+        self.dirty = set()
+        return self.dirty
+
+    def preorderDirty(self, name, func):
+        #Runs a preorder pass which has already been applied to the whole tree, visiting only
+        #scopes changed since track() was called. The callback must be idempotent.
+        #Returns the set of scopes visited
+        self.flush()
+        visit = set()
+        self._timed(name, _dirtyPaths, self.root, self.dirty, visit)
+        if visit:
+            self._timed(name, _preorder, self.root, func, visit)
+        self.dirty = None
+        return visit
+
 def _pruneVoidReturn(scope):
     if scope.statements:
         last = scope.statements[-1]
@@ -741,12 +878,16 @@ def generateAST(method, graph, forbidden_identifiers):
     tts = objtypes.verifierToSynthetic_seq(inputTypes)
 
     if graph is not None:
-        entryNode, nodes = graphproxy.createGraphProxy(graph)
+        with instrument.phase('createGraphProxy'):
+            entryNode, nodes = graphproxy.createGraphProxy(graph)
         if not method.static:
             entryNode.invars[0].name = 'this'
 
-        setree = structuring.structure(entryNode, nodes, (method.name == '<clinit>'))
-        ast_root, varinfo = astgen.createAST(method, graph, setree, namegen)
+        with instrument.phase('structure'):
+            setree = structuring.structure(entryNode, nodes, (method.name == '<clinit>'))
+        instrument.note(nodes=len(nodes)) #structuring may duplicate nodes
+        with instrument.phase('createAST'):
+            ast_root, varinfo = astgen.createAST(method, graph, setree, namegen)
 
         argsources = [varinfo.var(entryNode, var) for var in entryNode.invars]
         disp_args = argsources if method.static else argsources[1:]
@@ -759,24 +900,30 @@ def generateAST(method, graph, forbidden_identifiers):
 
         # print ast_root.print_()
         assert(_generateJumps(ast_root, dryRun=True) is None)
-        _preorder(ast_root, _fixObjectCreations)
-        boolize.boolizeVars(ast_root, argsources)
-        _simplifyBlocks(ast_root)
+        passes = _PassManager(ast_root)
+        passes.preorder('fixObjectCreations', _fixObjectCreations)
+        passes.run('boolizeVars', boolize.boolizeVars, argsources)
+        passes.run('simplifyBlocks', _simplifyBlocks)
         assert(_generateJumps(ast_root, dryRun=True) is None)
 
-        _mergeVariables(ast_root, argsources)
-        _preorder(ast_root, _createTernaries)
-        _inlineVariables(ast_root)
-        _simplifyBlocks(ast_root)
-        _preorder(ast_root, _createTernaries)
-        _inlineVariables(ast_root)
-        _simplifyBlocks(ast_root)
-
-        _createDeclarations(ast_root, argsources)
-        _preorder(ast_root, partial(_fixExprStatements, namegen=namegen))
-        _preorder(ast_root, partial(_addCastsAndParens, env=env))
-        _generateJumps(ast_root)
-        _pruneVoidReturn(ast_root)
+        varmap = passes.run('mergeVariables', _mergeVariables, argsources)
+        passes.preorder('replaceExpressions', partial(_replaceExpressions, rdict=varmap))
+        passes.preorder('createTernaries', _createTernaries)
+        dirty = passes.track()
+        index = _UseDefIndex()
+        passes.run('indexVariables', index.refresh)
+        passes.run('inlineVariables', _inlineVariables, index, dirty)
+        passes.run('simplifyBlocks', _simplifyBlocks, dirty)
+        dirty |= passes.preorderDirty('createTernaries', _createTernaries)
+        passes.run('indexVariables', index.refresh, dirty)
+        passes.run('inlineVariables', _inlineVariables, index)
+        passes.run('simplifyBlocks', _simplifyBlocks)
+
+        passes.run('createDeclarations', _createDeclarations, argsources)
+        passes.preorder('fixExprStatements', partial(_fixExprStatements, namegen=namegen))
+        passes.preorder('addCastsAndParens', partial(_addCastsAndParens, env=env))
+        passes.run('generateJumps', _generateJumps)
+        passes.run('pruneVoidReturn', _pruneVoidReturn)
     else: #abstract or native method
         ast_root = None
         argsources = [ast.Local(tt, lambda expr:namegen.getPrefix('arg')) for tt in tts]
@@ -8,6 +8,8 @@ def update(self, items):
     self.successors = [n for n in siter if not n in temp and not temp.add(n)]
 
 class SEBlockItem(object):
+    __slots__ = 'entryBlock nodes successors node'.split()
+
     def __init__(self, node):
         self.successors = node.norm_suc_nl #don't include backedges or exceptional edges
         self.node = node 
@@ -17,6 +19,8 @@ class SEBlockItem(object):
     def getScopes(self): return ()    
 
 class SEScope(object):
+    __slots__ = 'entryBlock nodes successors items'.split()
+
     def __init__(self, items):
         self.items = items
         update(self, items)
@@ -24,6 +28,8 @@ class SEScope(object):
     def getScopes(self): return ()    
 
 class SEWhile(object):
+    __slots__ = 'entryBlock nodes successors body'.split()
+
     def __init__(self, scope):
         self.body = scope
         update(self, [scope])
@@ -31,6 +37,8 @@ class SEWhile(object):
     def getScopes(self): return self.body,    
 
 class SETry(object):
+    __slots__ = 'entryBlock nodes successors scopes toptts catchvar'.split()
+
     def __init__(self, tryscope, catchscope, toptts, catchvar):
         self.scopes = tryscope, catchscope
         self.toptts = toptts
@@ -40,6 +48,8 @@ class SETry(object):
     def getScopes(self): return self.scopes
 
 class SEIf(object):
+    __slots__ = 'entryBlock nodes successors scopes head'.split()
+
     def __init__(self, head, newscopes):
         assert(len(newscopes) == 2)
         self.scopes = newscopes
@@ -49,6 +59,8 @@ class SEIf(object):
     def getScopes(self): return self.scopes
 
 class SESwitch(object):
+    __slots__ = 'entryBlock nodes successors scopes head ordered ordered_keysets'.split()
+
     def __init__(self, head, newscopes):
         self.scopes = newscopes
         self.head = head
@@ -0,0 +1,55 @@
+import StringIO
+
+#Writes generated source to a file like object as it is produced, rather than building up strings
+#and reindenting them at every level of nesting. Text is split into lines the same way str.splitlines
+#does, and each line is prefixed with the indentation of the level it was written at.
+class SourceWriter(object):
+    def __init__(self, sink, indent='    '):
+        self.sink = sink
+        self.indentStr = indent
+        self.prefixes = ['']
+        self.cur = None #text of the line in progress, or None if there is none
+        self.first = True
+
+    def _emitLine(self, line):
+        if not self.first:
+            self.sink.write('\n')
+        self.first = False
+        self.sink.write(self.prefixes[-1])
+        self.sink.write(line)
+
+    def write(self, s):
+        for seg in s.splitlines(True):
+            text = seg.splitlines()[0]
+            if text != seg: #ends with a line break
+                self._emitLine(text if self.cur is None else self.cur + text)
+                self.cur = None
+            else:
+                self.cur = text if self.cur is None else self.cur + text
+
+    def _endLine(self):
+        if self.cur is not None:
+            self._emitLine(self.cur)
+            self.cur = None
+
+    def indent(self):
+        #Ends the current line and starts a nested level
+        self._endLine()
+        self.prefixes.append(self.prefixes[-1] + self.indentStr)
+
+    def dedent(self):
+        #Ends the nested level. Subsequent text begins a new line
+        self._endLine()
+        self.prefixes.pop()
+
+    def finish(self):
+        assert(len(self.prefixes) == 1)
+        self._endLine()
+
+def printToString(node):
+    '''Returns the source for node as a string'''
+    buf = StringIO.StringIO()
+    out = SourceWriter(buf)
+    node.write(out)
+    out.finish()
+    return buf.getvalue()
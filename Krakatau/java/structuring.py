@@ -1,7 +1,7 @@
 import collections, itertools, functools
 ddict = collections.defaultdict
 
-from .. import graph_util
+from .. import graph_util, instrument
 from . import graphproxy
 
 from ..ssa import ssa_jumps
@@ -32,37 +32,53 @@ from .setree import SEBlockItem, SEScope, SEIf, SESwitch, SETry, SEWhile
 #########################################################################################
 class DominatorInfo(object):
     def __init__(self, root):
-        self._doms = doms = {root:(root,)}
+        graph = graph_util.fromProxies(root)
+        nodes = graph.nodes
+        idom = {nodes[x]:nodes[d] for x, d in enumerate(graph.dominators())}
+        rpo = [nodes[x] for x in graph.reversePostorder()]
+
+        #Number the dominator tree in preorder so that each subtree is a contiguous interval
+        children = ddict(list)
+        for n in rpo[1:]:
+            children[idom[n]].append(n)
+        self._order = order = []
         stack = [root]
         while stack:
             cur = stack.pop()
-            assert(cur not in stack)
-            for child in cur.successors:
-                new = doms[cur] + (child,)
-                old = doms.get(child)
-                if new != old:
-                    new = new if old is None else tuple(x for x in old if x in new)
-                    assert(child == new[-1])
-                if old is not None:
-                    assert(new == old or len(new) < len(old))
-                    assert(new[0] == root and new[-1] == child)
-                if new != old:
-                    doms[child] = new
-                    if child not in stack:
-                        stack.append(child)
-        self.nodeset = set(self._doms)
+            order.append(cur)
+            stack.extend(reversed(children[cur]))
+        self._pre = pre = {n:i for i,n in enumerate(order)}
+        self._end = end = {}
+        for n in reversed(order):
+            end[n] = max([pre[n]+1] + [end[c] for c in children[n]])
+
+        self._idom = idom
+        self.nodeset = set(order)
         self.root = root
 
+    def dominates(self, x, node):
+        return self._pre[x] <= self._pre[node] < self._end[x]
+
     def dominators(self, node):
-        return self._doms[node]
+        #Note: this is computed on each call to avoid storing a path for every node
+        path = [node]
+        while node != self.root:
+            node = self._idom[node]
+            path.append(node)
+        return tuple(reversed(path))
 
     def dominator(self, nodes):
         '''Get the common dominator of nodes'''
-        return [x for x in zip(*map(self._doms.get, nodes)) if len(set(x))==1][-1][0]
+        nodes = iter(nodes)
+        cur = next(nodes)
+        for n in nodes:
+            while not self.dominates(cur, n):
+                cur = self._idom[cur]
+        return cur
 
     def area(self, node):
-        #Note, if changed to store a set, make sure to copy it, as returned sets are mutated
-        return set(k for k,v in self._doms.items() if node in v)
+        #Note, returned sets are mutated, so make sure to return a new set each time
+        return set(self._order[self._pre[node]:self._end[node]])
 
     def extend(self, nodes):
         dom = self.dominator(nodes)
@@ -221,7 +237,7 @@ def structureConditionals(entryNode, nodes):
     for n in switchnodes:
         # import pdb;pdb.set_trace()
         targets = n.successors
-        bad = [x for x in targets if n not in dom.dominators(x)]
+        bad = [x for x in targets if not dom.dominates(n, x)]
         good = [x for x in targets if x not in bad]
 
         domains = {x:dom.area(x) for x in good}
@@ -318,7 +334,7 @@ def createConstraints(dom, while_heads, newtryinfos, switchinfos, ifinfos):
         last = []
         scopes = []
         for target in reversed(ordered):
-            fallthroughs = [x for x in last if target in dom.dominators(x)]
+            fallthroughs = [x for x in last if dom.dominates(target, x)]
             assert(n not in fallthroughs)
             last = target.predecessors
 
@@ -346,7 +362,7 @@ def orderConstraints(dom, constraints, nodes):
     frozen = set()
 
     node_set = set(nodes)
-    assert(set(dom._doms) == node_set)
+    assert(dom.nodeset == node_set)
     for item in constraints:
         assert(item.lbound <= node_set)
         assert(item.ubound <= node_set)
@@ -471,7 +487,9 @@ def mergeExceptions(dom, children, constraints, nodes):
                 assert(parents[child][0] == parent)
                 parents[child] = con, scope
                 children[con].append(child)
-                children[parent].remove(child)
+        #Filter all at once, since removing each child in turn is quadratic when there are many
+        moved = set(children[con])
+        children[parent] = [c for c in children[parent] if c not in moved]
         children[parent].append(con)
 
     def unforbid(forbidden, newdown):
@@ -495,6 +513,7 @@ def mergeExceptions(dom, children, constraints, nodes):
             ubound &= tcon.lbound
 
         while 1:
+            instrument.checkBudget()
             done = True
             parent, pscope = parents[con]
             #Ugly hack to work around the fact that try bodies are temporarily stored
@@ -614,6 +633,7 @@ def mergeExceptions(dom, children, constraints, nodes):
 
         success = {}
         for con2 in candidates:
+            instrument.checkBudget()
             success[con2] = tryExtend(con, con2.lbound, con2.cset, con2.forcedup, con2.forceddown, removed)
 
         #Now find which ones can be removed
@@ -699,7 +719,7 @@ def mergeExceptions(dom, children, constraints, nodes):
 
     #Regenerate dominator info to take removed nodes into account
     dom = DominatorInfo(dom.root)
-    assert(set(dom._doms) == node_set)
+    assert(dom.nodeset == node_set)
     return dom, constraints, nodes
 
 def fixTryConstraints(dom, constraints):
@@ -707,6 +727,7 @@ def fixTryConstraints(dom, constraints):
     for con in constraints:
         if con.tag != 'try':
             continue
+        instrument.checkBudget()
 
         lbound = set([con.target])
         ubound = dom.area(con.target)
@@ -750,54 +771,91 @@ def _dominatorUBoundClosure(dom, lbound, ubound):
     assert(udom == dom.dominator(ubound))
     return ubound
 
-def _augmentingPath(startnodes, startset, endset, used, backedge, bound):
-    #Find augmenting path via BFS
-    queue = collections.deque([(n,True,(n,)) for n in startnodes if n not in used])
-
-    seen = set((n,True) for n in startnodes)
-    while queue:
-        pos, lastfw, path = queue.popleft()
-
-        canfwd = not lastfw or pos not in used
-        canback = pos in used and pos not in startset
-
-        if canfwd:
-            if pos in endset: #success!
-                return path, None
-            successors = [x for x in pos.successors_nl if x in bound]
-            for pos2 in successors:
-                if (pos2, True) not in seen:
-                    seen.add((pos2, True))
-                    queue.append((pos2, True, path+(pos2,)))
-        if canback:
-            pos2 = backedge[pos]
-            if (pos2, False) not in seen:
-                seen.add((pos2, False))
-                queue.append((pos2, False, path+(pos2,)))
-    else: #queue is empty but we didn't find anything
-        return None, set(x for x,front in seen if front)
-
-def _mincut(startnodes, endnodes, bound):
-    startset = frozenset(startnodes)
-    endset = frozenset(endnodes)
-    bound = bound | endset
-    used = set()
-    backedge = {}
-
-    while 1:
-        path, lastseen = _augmentingPath(startnodes, startset, endset, used, backedge, bound)
-        if path is None:
-            return lastseen | (startset & used)
-
-        assert(path[0] in startset and path[-1] in endset)
-        for pos, last in zip(path, (None,)+path):
-            if last in pos.norm_suc_nl:
-                assert(pos in used)
-                assert(backedge[pos] != last)
+class _FlowGraph(object):
+    #Integer indexed view of the backedge free graph used to find min vertex cuts. Each node i is
+    #split into an in vertex 2i and out vertex 2i+1 joined by an arc of capacity 1
+    def __init__(self, nodes):
+        self.nodes = nodes = list(nodes)
+        self.ids = ids = {n:i for i,n in enumerate(nodes)}
+        self.successors = [[ids[x] for x in n.successors_nl] for n in nodes]
+
+    def mincut(self, startnodes, endnodes, bound):
+        ids = self.ids
+        start = [ids[n] for n in startnodes]
+        startset = frozenset(start)
+        endset = frozenset(ids[n] for n in endnodes)
+        inbound = frozenset(ids[n] for n in bound) | endset
+        source, sink = -1, -2
+
+        #Arcs are stored in parallel lists, with arc a^1 being the reverse of arc a
+        adj = ddict(list)
+        to, cap = [], []
+        def addArc(u, v, c):
+            adj[u].append(len(to))
+            to.append(v)
+            cap.append(c)
+            adj[v].append(len(to))
+            to.append(u)
+            cap.append(0)
+
+        inf = len(start) + 1
+        for v in start:
+            addArc(source, 2*v, 1)
+        for v in sorted(startset | inbound):
+            addArc(2*v, 2*v+1, 1)
+            if v in endset:
+                addArc(2*v+1, sink, inf)
             else:
-                used.add(pos)
-                backedge[pos] = last
-                assert((backedge[pos] is None) == (pos in startset))
+                for w in self.successors[v]:
+                    if w in inbound and w not in startset:
+                        addArc(2*v+1, 2*w, inf)
+
+        #Dinic's algorithm. Every augmenting path passes through a source arc, so each carries one unit
+        while 1:
+            level = {source:0}
+            queue = collections.deque([source])
+            while queue:
+                u = queue.popleft()
+                for a in adj[u]:
+                    if cap[a] and to[a] not in level:
+                        level[to[a]] = level[u] + 1
+                        queue.append(to[a])
+            if sink not in level:
+                break
+
+            ptr = dict.fromkeys(level, 0)
+            path = []
+            u = source
+            while 1:
+                arcs = adj[u]
+                i = ptr[u]
+                while i < len(arcs) and not (cap[arcs[i]] and level.get(to[arcs[i]]) == level[u] + 1):
+                    i += 1
+                ptr[u] = i
+
+                if i < len(arcs):
+                    path.append(arcs[i])
+                    u = to[arcs[i]]
+                    if u == sink:
+                        for a in path:
+                            cap[a] -= 1
+                            cap[a^1] += 1
+                        path = []
+                        u = source
+                elif u == source:
+                    break
+                else: #dead end, so retreat
+                    del level[u]
+                    u = to[path.pop()^1]
+                    ptr[u] += 1
+
+        #The final search gives the residual reachable set. We want the in vertices reached by a
+        #forward arc, plus the start nodes
+        lastseen = set(startset)
+        for u in level:
+            if u >= 0 and u % 2:
+                lastseen.update(to[a]//2 for a in adj[u] if not a % 2 and to[a] >= 0)
+        return set(self.nodes[i] for i in lastseen)
 
 def completeScopes(dom, croot, children, isClinit):
     parentscope = {}
@@ -808,6 +866,7 @@ def completeScopes(dom, croot, children, isClinit):
             parentscope[child] = pscopes[0]
 
     nodeorder = graph_util.topologicalSort([dom.root], lambda n:n.successors_nl)
+    flowgraph = _FlowGraph(nodeorder)
     nodeorder = {n:-i for i,n in enumerate(nodeorder)}
 
     stack = [croot]
@@ -850,8 +909,8 @@ def completeScopes(dom, croot, children, isClinit):
             parts = [n.norm_suc_nl for n in sorted(ubound, key=nodeorder.get)]
             endnodes = [n for n in itertools.chain(*parts) if not n in temp and not temp.add(n)]
 
-            #Now use Edmonds-Karp, modified to find min vertex cut
-            lastseen = _mincut(startnodes, endnodes, frozenset(ubound))
+            #Now use max flow to find min vertex cut
+            lastseen = flowgraph.mincut(startnodes, endnodes, ubound)
 
             #Now we have the max flow, try to find the min cut
             #Just use the set of nodes visited during the final BFS
@@ -992,6 +1051,7 @@ def addBreakScopes(dom, croot, constraints, children):
 
     stack = [croot]
     while stack:
+        instrument.checkBudget()
         cnode = stack.pop()
         oldchildren = children[cnode][:]
         newchildren = children[cnode] = []
@@ -1138,7 +1198,8 @@ def structure(entryNode, nodes, isClinit):
 
     # print 'exception merging'
     #May remove nodes (and update dominator info)
-    dom, constraints, nodes = mergeExceptions(dom, ctree_children, constraints, nodes)
+    with instrument.phase('mergeExceptions'):
+        dom, constraints, nodes = mergeExceptions(dom, ctree_children, constraints, nodes)
 
     # handles = [c.orig_target for c in constraints if c.tag=='try']
     # assert(len(handles) == len(set(handles)))
@@ -1152,10 +1213,8 @@ def structure(entryNode, nodes, isClinit):
 
     #now that no more nodes will be changed, create lists of backedge free edges
     for n in nodes:
-        temp = set(dom.dominators(n))
-        temp2 = dom.area(n)
-        n.successors_nl = [x for x in n.successors if x not in temp]
-        n.predecessors_nl = [x for x in n.predecessors if x not in temp2]
+        n.successors_nl = [x for x in n.successors if not dom.dominates(x, n)]
+        n.predecessors_nl = [x for x in n.predecessors if not dom.dominates(n, x)]
         n.norm_suc_nl = [x for x in n.successors_nl if x in n.outvars]
     for n in nodes:
         for n2 in n.successors_nl:
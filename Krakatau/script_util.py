@@ -87,6 +87,9 @@ def fileDirOut(base_path, suffix):
             os.makedirs(dirpath)
 
         with open(out,'wb') as f:
-            f.write(data)
+            if callable(data): #allow writing the file incrementally
+                data(f)
+            else:
+                f.write(data)
         return out
     return write
\ No newline at end of file
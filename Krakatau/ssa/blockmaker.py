@@ -1,4 +1,4 @@
-import collections
+import bisect, collections
 
 from . import ssa_ops, ssa_jumps, objtypes, subproc
 from .. import opnames as vops
@@ -424,28 +424,69 @@ def getOnNoExceptionTarget(parent, iNode):
         return iNode.successors[0]
     return None
 
-def fromInstruction(parent, iNode, initMap):
-    assert(iNode.visited)
-    instr = iNode.instruction
-
+def liveLocals(iNodes, except_raw):
+    '''Returns a dict of bitmasks of the locals live on entry to each visited iNode, or None if the method has subprocedures'''
+    nodes = [node for node in iNodes if node.visited]
+    #Subprocedure inlining needs every slot to be available at jsrs and rets
+    if any(node.instruction[0] == vops.RET for node in nodes):
+        return None
+
+    keys = [node.key for node in nodes]
+    succs = {node.key:list(node.successors) for node in nodes}
+    for raw in except_raw:
+        if raw.handler in succs: #skip handlers that are never reached
+            for key in keys[bisect.bisect_left(keys, raw.start):bisect.bisect_left(keys, raw.end)]:
+                succs[key].append(raw.handler)
+
+    uses, kept = {}, {} #locals read by each instruction, and those not overwritten
+    for node in nodes:
+        instr = node.instruction
+        use = define = 0
+        if instr[0] == vops.LOAD:
+            use = ((1 << getCategory(instr[1])) - 1) << instr[2]
+        elif instr[0] == vops.STORE:
+            define = ((1 << getCategory(instr[1])) - 1) << instr[2]
+        elif instr[0] == vops.IINC:
+            use = 1 << instr[1]
+        uses[node.key], kept[node.key] = use, ~define
+
+    preds = collections.defaultdict(list)
+    for key in keys:
+        for k in succs[key]:
+            preds[k].append(key)
+
+    #Standard backwards dataflow, with bitmasks as sets
+    live = dict.fromkeys(keys, 0)
+    stack, queued = keys[:], set(keys)
+    while stack:
+        key = stack.pop()
+        queued.remove(key)
+        out = 0
+        for k in succs[key]:
+            out |= live[k]
+        new = uses[key] | (out & kept[key])
+        if new != live[key]:
+            live[key] = new
+            for k in preds[key]:
+                if k not in queued:
+                    queued.add(k)
+                    stack.append(k)
+    return live
+
+def _newBlock(parent, iNode, initMap, live):
     monad = parent.makeVariable(SSA_MONAD)
     stack = [parent.makeVarFromVtype(vt, initMap) for vt in iNode.stack]
-    locals_ = [parent.makeVarFromVtype(vt, initMap) for vt in iNode.locals]
-    inslots = slots_t(monad=monad, locals=locals_, stack=stack)
+    #Dead locals don't get variables, so we don't have to create phis for them only to remove them again
+    mask = -1 if live is None else live[iNode.key]
+    locals_ = [(parent.makeVarFromVtype(vt, initMap) if mask >> i & 1 else None) for i, vt in enumerate(iNode.locals)]
 
-    if iNode.before is not None and '1' in iNode.before:
-        func = genericStackUpdate
-    else:
-        func = _instructionHandlers[instr[0]]
-    vals = func(parent, inslots, iNode)
+    block = BasicBlock(iNode.key, lines=[], jump=None)
+    block.inslots = slots_t(monad=monad, locals=locals_, stack=stack)
+    block.tempvars = []
+    return block
 
-    line, jump = map(vals.get, ('line','jump'))
-    newstack = vals.get('newstack', stack)
-    newlocals = vals.get('newlocals', locals_)
-    newmonad = line.outMonad if (line and line.outMonad) else monad
-    outslot_norm = slots_t(monad=newmonad, locals=newlocals, stack=newstack)
-
-    lines = [line] if line is not None else []
+def _endBlock(parent, block, iNode, line, jump, outslot_norm):
+    instr = iNode.instruction
     successorStates = [((nodekey, False), outslot_norm) for nodekey in iNode.successors]
 
     #Return iNodes obviously don't have our synethetic return node as a normal successor
@@ -457,16 +498,59 @@ def fromInstruction(parent, iNode, initMap):
         fallthrough = getOnNoExceptionTarget(parent, iNode)
 
         jump = ssa_jumps.OnException(parent, iNode.key, line, parent.rawExceptionHandlers(), fallthrough)
-        outslot_except = slots_t(monad=newmonad, locals=newlocals, stack=[line.outException])
+        outslot_except = slots_t(monad=outslot_norm.monad, locals=outslot_norm.locals, stack=[line.outException])
         successorStates += [((nodekey, True), outslot_except) for nodekey in jump.getExceptSuccessors()]
 
     if not jump:
         assert(instr[0] == vops.RETURN or len(iNode.successors) == 1)
         jump = ssa_jumps.Goto(parent, getOnNoExceptionTarget(parent, iNode))
 
-    block = BasicBlock(iNode.key, lines=lines, jump=jump)
-    block.inslots = inslots
+    block.jump = jump
     block.successorStates = collections.OrderedDict(successorStates)
-    #store these vars in case we created any constants in the block that won't show up later
-    block.tempvars = [var for var in newstack + newlocals if var is not None]
-    return block
\ No newline at end of file
+    block.tempvars += [var for var in outslot_norm.locals if var is not None]
+
+def makeBlocks(parent, iNodes, initMap, except_raw, live=None):
+    '''Creates blocks from the visited iNodes, each holding a run of instructions which can only be entered at the top'''
+    nodes = [node for node in iNodes if node.visited]
+    #An instruction can be added to the block before it only if it's reached by falling through from there alone
+    predCounts = collections.Counter(k for node in nodes for k in node.successors)
+    predCounts[nodes[0].key] += 1 #from the entry block
+    leaders = set(key for key, count in predCounts.items() if count != 1)
+    leaders.update(raw.handler for raw in except_raw)
+    #Rets get their own block, since subproc handling copies their input variables
+    leaders.update(node.key for node in nodes if node.instruction[0] == vops.RET)
+
+    blocks = []
+    block = None
+    for iNode in nodes:
+        if block is None:
+            block = _newBlock(parent, iNode, initMap, live)
+            blocks.append(block)
+            slots = block.inslots
+
+        instr = iNode.instruction
+        if iNode.before is not None and '1' in iNode.before:
+            func = genericStackUpdate
+        else:
+            func = _instructionHandlers[instr[0]]
+        vals = func(parent, slots, iNode)
+
+        line, jump = map(vals.get, ('line','jump'))
+        newstack = vals.get('newstack', slots.stack)
+        newlocals = vals.get('newlocals', slots.locals)
+        newmonad = line.outMonad if (line and line.outMonad) else slots.monad
+        slots = slots_t(monad=newmonad, locals=newlocals, stack=newstack)
+
+        if line is not None:
+            block.lines.append(line)
+        #store these vars in case we created any constants in the block that won't show up later
+        block.tempvars += [var for var in newstack if var is not None]
+
+        #Since only instructions that can throw get exception edges, and they always end the block,
+        #the boundaries of the exception ranges don't matter here
+        if (jump or (line and line.outException) or iNode.successors != (iNode.next_instruction,)
+                or iNode.next_instruction in leaders):
+            _endBlock(parent, block, iNode, line, jump, slots)
+            block = None
+    assert(block is None)
+    return blocks
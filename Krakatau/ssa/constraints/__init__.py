@@ -20,6 +20,12 @@ def join(*cons):
 def meet(*cons):
     return cons[0].meet(*cons[1:])
 
+def widen(old, new, thresholds=()):
+    #Only integer ranges can grow by a little on each iteration, so other constraints are left as is
+    if old is None or new is None or not isinstance(new, IntConstraint):
+        return new
+    return old.widen(new, thresholds)
+
 DUMMY = DummyConstraint()
 
 def fromConstant(env, var):
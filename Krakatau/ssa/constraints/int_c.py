@@ -1,3 +1,5 @@
+import bisect
+
 from ..mixin import ValueType
 
 class IntConstraint(ValueType):
@@ -43,5 +45,22 @@ class IntConstraint(ValueType):
         xmax = max(c.max for c in cons)
         return IntConstraint(cons[0].width, xmin, xmax)
 
+    def widen(self, new, thresholds=()):
+        '''Returns a range containing both, where any bound of new that grows past self is pushed
+        out to the next threshold (a sorted sequence of values), or failing that to the type bound'''
+        #A strict comparison against an unknown value leaves a counter one short of the type bound,
+        #so stop there first. Otherwise incrementing it afterwards would appear to overflow
+        bot = IntConstraint.bot(self.width)
+        xmin, xmax = min(self.min, new.min), max(self.max, new.max)
+        if xmin < self.min:
+            i = bisect.bisect_right(thresholds, xmin)
+            low = thresholds[i-1] if i else bot.min
+            xmin = max(low, bot.min+1) if xmin > bot.min else bot.min
+        if xmax > self.max:
+            i = bisect.bisect_left(thresholds, xmax)
+            high = thresholds[i] if i < len(thresholds) else bot.max
+            xmax = min(high, bot.max-1) if xmax < bot.max else bot.max
+        return IntConstraint(self.width, xmin, xmax)
+
     def __str__(self): return self.print_('?')
     def __repr__(self): return self.print_('?')
\ No newline at end of file
@@ -2,45 +2,103 @@ import collections, itertools
 from . import objtypes
 from .mixin import ValueType
 
-class CatchSetManager(object):
-    def __init__(self, env, chpairs, attributes=None):
-        if attributes is not None:
-            self.env, self.sets, self.mask = attributes
+class _SetCache(object):
+    '''Interned ExceptionSets and memoized set algebra results for a single environment'''
+    limit = 1<<16 #arbitrary limit on the number of memoized results, to bound memory use
+
+    def __init__(self):
+        self.interned = {}
+        self.results = {}
+        self.hits = self.misses = 0
+
+    def intern(self, eset):
+        eset = self.interned.setdefault(eset, eset)
+        eset.cache = self
+        return eset
+
+    def memoize(self, op, x, y, func):
+        #Operands are interned, so equal sets are always the same object
+        #and the dict lookup will succeed on the identity check
+        key = op, x, y
+        try:
+            result = self.results[key]
+        except KeyError:
+            self.misses += 1
+            if len(self.results) >= self.limit:
+                self.results.clear()
+            result = self.results[key] = func(y)
         else:
-            self.env = env
-            self.sets = collections.OrderedDict() #make this ordered since OnException relies on it
-
-            sofar = empty = ExceptionSet.EMPTY
-            for catchtype, handler in chpairs:
-                old = self.sets.get(handler, empty)
-                new = ExceptionSet.fromTops(env, catchtype)
-                self.sets[handler] = old | (new - sofar)
-                sofar = sofar | new
-            self.mask = sofar
-            self.pruneKeys()
-        assert(not self._conscheck())
+            self.hits += 1
+        return result
+
+def _getCache(env):
+    #Kept on the environment rather than in a global table, since the interned sets refer back to
+    #the environment and would otherwise keep it alive forever
+    if env.exceptionSetCache is None:
+        env.exceptionSetCache = _SetCache()
+    return env.exceptionSetCache
+
+def cacheStats(env):
+    '''Returns (hits, misses, number of interned sets) for ExceptionSet operations in env'''
+    cache = env.exceptionSetCache
+    if cache is None:
+        return 0, 0, 0
+    return cache.hits, cache.misses, len(cache.interned)
 
-    def newMask(self, mask):
-        for k in self.sets:
-            self.sets[k] &= mask
-        self.mask &= mask
+class CatchSetManager(object):
+    '''The exceptions caught by each handler of an OnException jump
+
+    Managers are never modified once created. Instead, updates return a new manager, interned in the
+    table of the graph, so all the jumps in a protected region share a single instance'''
+    def __init__(self, env, sets, mask, table):
+        self.env = env
+        self.sets = sets #ordered, since OnException relies on it
+        self.mask = mask
+        self.table = table
         assert(not self._conscheck())
 
-    def pruneKeys(self):
-        for handler, catchset in list(self.sets.items()):
-            if not catchset:
-                del self.sets[handler]
+    @staticmethod #factory
+    def make(env, chpairs, table):
+        chpairs = tuple(chpairs)
+        try:
+            return table['handlers', chpairs]
+        except KeyError:
+            pass
+
+        sets = collections.OrderedDict()
+        sofar = empty = ExceptionSet.EMPTY
+        for catchtype, handler in chpairs:
+            old = sets.get(handler, empty)
+            new = ExceptionSet.fromTops(env, catchtype)
+            sets[handler] = old | (new - sofar)
+            sofar = sofar | new
+        table['handlers', chpairs] = manager = CatchSetManager._intern(env, sets, sofar, table)
+        return manager
 
-    def copy(self):
-        return CatchSetManager(0,0,(self.env, self.sets.copy(), self.mask))
+    @staticmethod
+    def _intern(env, sets, mask, table):
+        sets = collections.OrderedDict((handler, catchset) for handler, catchset in sets.items() if catchset)
+        key = tuple(sets.items()), mask
+        try:
+            return table[key]
+        except KeyError:
+            table[key] = manager = CatchSetManager(env, sets, mask, table)
+            return manager
+
+    def _update(self, sets, mask):
+        return CatchSetManager._intern(self.env, sets, mask, self.table)
+
+    def newMask(self, mask):
+        return self._update(collections.OrderedDict((k, v & mask) for k, v in self.sets.items()), self.mask & mask)
 
-    def replaceKey(self, old, new):
-        assert(old in self.sets and new not in self.sets)
-        self.sets[new] = self.sets[old]
-        del self.sets[old]
+    def removeKeys(self, keys):
+        mask = self.mask
+        for key in keys:
+            mask -= self.sets[key]
+        return self._update(collections.OrderedDict((k, v) for k, v in self.sets.items() if k not in keys), mask)
 
     def replaceKeys(self, replace):
-        self.sets = collections.OrderedDict((replace.get(key,key), val) for key, val in self.sets.items())
+        return self._update(collections.OrderedDict((replace.get(key,key), val) for key, val in self.sets.items()), self.mask)
 
     def _conscheck(self):
         temp = ExceptionSet.EMPTY
@@ -50,9 +108,10 @@ class CatchSetManager(object):
         assert(temp == self.mask)
 
 class ExceptionSet(ValueType):
-    __slots__ = "env pairs".split()
+    __slots__ = "env pairs cache".split()
     def __init__(self, env, pairs): #assumes arguments are in reduced form
         self.env = env
+        self.cache = None #set when interned
         self.pairs = frozenset([(x,frozenset(y)) for x,y in pairs])
         assert(not pairs or '.null' not in zip(*pairs)[0])
         #We allow env to be None for the empty set so we can construct empty sets easily
@@ -66,9 +125,17 @@ class ExceptionSet(ValueType):
             parts.extend(holes)
         assert(len(set(parts)) == len(parts))
 
+    @staticmethod #factory
+    def make(env, pairs):
+        #All nonempty sets should be created through here so that they are interned
+        new = ExceptionSet(env, pairs)
+        if new.empty():
+            return ExceptionSet.EMPTY
+        return _getCache(env).intern(new)
+
     @staticmethod #factory
     def fromTops(env, *tops):
-        return ExceptionSet(env, [(x, frozenset()) for x in tops])
+        return ExceptionSet.make(env, [(x, frozenset()) for x in tops])
 
     def _key(self): return self.pairs
     def empty(self): return not self.pairs
@@ -86,7 +153,9 @@ class ExceptionSet(ValueType):
             return self
         if self == other:
             return ExceptionSet.EMPTY
+        return self.cache.memoize('-', self, other, self._sub)
 
+    def _sub(self, other):
         subtest = self.env.isSubclass
         pairs = self.pairs
 
@@ -103,12 +172,21 @@ class ExceptionSet(ValueType):
             return self
         if self.empty():
             return other
+        return self.cache.memoize('|', self, other, self._or)
+
+    def _or(self, other):
         return ExceptionSet.reduce(self.env, self.pairs | other.pairs)
 
     def __and__(self, other):
         assert(type(self) == type(other))
-        new = self - (self - other)
-        return new
+        if self.empty() or other.empty():
+            return ExceptionSet.EMPTY
+        if self == other:
+            return self
+        return self.cache.memoize('&', self, other, self._and)
+
+    def _and(self, other):
+        return self - (self - other)
 
     def isdisjoint(self, other):
         return (self-other) == self
@@ -210,6 +288,6 @@ class ExceptionSet(ValueType):
             else:
                 holes = ExceptionSet.reduceHoles(subtest, holes)
                 newpairs.append((top,holes))
-        return ExceptionSet(env, newpairs)
+        return ExceptionSet.make(env, newpairs)
 
 ExceptionSet.EMPTY = ExceptionSet(None, [])
\ No newline at end of file
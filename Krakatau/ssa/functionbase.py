@@ -1,4 +1,6 @@
 class SSAFunctionBase(object):
+    __slots__ = 'parent params'.split()
+
     def __init__(self, parent, arguments):
         self.parent = parent
         self.params = list(arguments)
@@ -1,15 +1,27 @@
 import itertools, collections, copy
 ODict = collections.OrderedDict
 
-from . import blockmaker,constraints, variablegraph, objtypes, subproc
+from . import blockmaker,constraints, variablegraph, objtypes, sccp, subproc
 from . import ssa_jumps, ssa_ops
 from ..verifier.descriptors import parseUnboundMethodDescriptor
-from .. import graph_util
+from .. import graph_util, instrument
 
 from .. import opnames
 from ..verifier import verifier_types
-from .ssa_types import SSA_OBJECT, SSA_MONAD
+from .ssa_types import SSA_INT, SSA_LONG, SSA_FLOAT, SSA_DOUBLE, SSA_OBJECT, SSA_MONAD
 from .ssa_types import slots_t, BasicBlock, verifierToSSAType
+from .exceptionset import CatchSetManager
+
+#Set to run the (expensive) sanity checks on the graph between passes. Useful for debugging
+CHECK_CONSISTENCY = 0
+
+#Maximum number of blocks to copy when inlining subprocedures with multiple callsites. Since nested
+#subprocedures are copied into each of their callers, the number of copies grows exponentially with
+#the depth of nesting, so past this point the remaining subprocedures are shared instead
+SUBPROC_CLONE_LIMIT = 200
+
+#Constants used as placeholders for values which are not defined along every path into a shared subprocedure
+_dummyConsts = {SSA_INT:0, SSA_LONG:0, SSA_FLOAT:0.0, SSA_DOUBLE:0.0, SSA_OBJECT:'null'}
 
 class SSA_Variable(object):
     __slots__ = 'type','origin','name','const','decltype'
@@ -85,14 +97,89 @@ class SSA_Graph(object):
 
         self.entryBlock, self.returnBlock, self.rethrowBlock = entryb, returnb, rethrowb
         self.blocks = None
+        self._analyses = None #analyses cached while running passes through runPasses
+        self._version = 0 #incremented whenever a pass reports a change to the graph
+        self._slotKeys = {} #identifies the slot held by phis at proc fallthroughs, for sharing procs
+        self._catchSets = {} #interned CatchSetManagers for the OnException jumps
         # self.procs = '' #used to store information on subprocedues (from the JSR instructions)
 
+    # Pass management ########################################################
+    #Passes which can safely be skipped if nothing has changed since they last ran
+    _idempotentPasses = frozenset(['condenseBlocks', 'mergeSingleSuccessorBlocks', 'removeUnusedVariables'])
+
+    def _changed(self):
+        self._version += 1
+        if self._analyses is not None:
+            self._analyses.clear()
+
+    def _analysis(self, key, compute):
+        #Outside of runPasses, the graph may be modified without notice, so don't cache anything
+        if self._analyses is None:
+            return compute()
+        if key not in self._analyses:
+            self._analyses[key] = compute()
+        return self._analyses[key]
+
+    def runPasses(self, names):
+        '''Run the named passes in order, caching analyses between them'''
+        self._analyses = {}
+        lastRun = {}
+        try:
+            for name in names:
+                if name in self._idempotentPasses and lastRun.get(name) == self._version:
+                    continue
+                with instrument.phase(name):
+                    getattr(self, name)()
+                lastRun[name] = self._version
+        finally:
+            self._analyses = None
+
+    # Control flow analyses ##################################################
+    #Like the other analyses, these are only cached while running passes
+    def _blockGraph(self):
+        return self._analysis('blockGraph', lambda:graph_util.fromSSABlocks(self.entryBlock))
+
+    def dominators(self):
+        '''Returns a dict mapping each reachable block to its immediate dominator. The entry block is its own'''
+        def compute():
+            graph = self._blockGraph()
+            nodes = graph.nodes
+            return {nodes[x]:nodes[d] for x, d in enumerate(graph.dominators())}
+        return self._analysis('dominators', compute)
+
+    def postDominators(self):
+        '''Returns a dict mapping each reachable block to its immediate post dominator, or None if there is
+        none other than the method exit'''
+        def compute():
+            graph = self._blockGraph()
+            nodes = graph.nodes
+            return {nodes[x]:(None if d is None else nodes[d]) for x, d in enumerate(graph.postDominators())}
+        return self._analysis('postDominators', compute)
+
+    def loopForest(self):
+        '''Returns the loop headers, outer loops first, and a dict mapping each reachable block to the header
+        of the innermost loop containing it (excluding the header itself), or None'''
+        def compute():
+            graph = self._blockGraph()
+            nodes = graph.nodes
+            headers, parents = graph.loopForest()
+            return [nodes[x] for x in headers], {nodes[x]:(None if h is None else nodes[h]) for x, h in enumerate(parents)}
+        return self._analysis('loopForest', compute)
+
+    def isReducible(self):
+        '''Returns whether every loop is only entered through its header'''
+        return self._analysis('isReducible', lambda:self._blockGraph().isReducible())
+
+    ##########################################################################
     def condenseBlocks(self):
         old = self.blocks
         #Can't do a consistency check on entry as the graph may be in an inconsistent state at this point
         #Since the purpose of this function is to prune unreachable blocks from self.blocks
 
-        sccs = graph_util.tarjanSCC([self.entryBlock], lambda block:block.jump.getSuccessors())
+        def compute():
+            graph = self._blockGraph()
+            return [tuple(graph.nodes[x] for x in scc) for scc in graph.sccs()]
+        sccs = self._analysis('sccs', compute)
         sccs = list(reversed(sccs))
         self.blocks = list(itertools.chain.from_iterable(map(reversed, sccs)))
 
@@ -119,16 +206,21 @@ class SSA_Graph(object):
                         block.jump = ssa_jumps.Goto(self, proc.target)
                     proc.callops = None
             self.procs = [proc for proc in self.procs if proc.callops]
+            self._changed()
+            return True
+        return False
 
-    def removeUnusedVariables(self):
-        assert(not self.procs)
+    def _getReachableVars(self):
         roots = [x for x in self.inputArgs if x is not None]
         for block in self.blocks:
             roots += block.jump.params
-        reachable = graph_util.topologicalSort(roots, lambda var:(var.origin.params if var.origin else []))
+        return graph_util.topologicalSort(roots, lambda var:(var.origin.params if var.origin else []))
 
-        keepset = set(reachable)
+    def removeUnusedVariables(self):
+        assert(not self.procs)
+        keepset = set(self._analysis('reachableVars', self._getReachableVars))
         assert(None not in keepset)
+        removed = []
         def filterOps(oldops):
             newops = []
             for op in oldops:
@@ -139,28 +231,39 @@ class SSA_Graph(object):
                     for v in op.getOutputs():
                         if v and v not in keepset:
                             op.removeOutput(v)
+                            removed.append(v)
                 else:
                     assert(keepset.isdisjoint(op.getOutputs()))
+                    removed.append(op)
             return newops
 
         for block in self.blocks:
+            oldcount = len(block.unaryConstraints)
             block.phis = filterOps(block.phis)
             block.lines = filterOps(block.lines)
             block.filterVarConstraints(keepset)
+            if len(block.unaryConstraints) < oldcount:
+                removed.append(block)
+
+        if removed:
+            self._changed()
+        return bool(removed)
 
     def _getSources(self):
-        sources = collections.defaultdict(set)
-        for block in self.blocks:
-            for child in block.getSuccessors():
-                sources[child].add(block)
-        return sources
+        def compute():
+            sources = collections.defaultdict(set)
+            for block in self.blocks:
+                for child in block.getSuccessors():
+                    sources[child].add(block)
+            return sources
+        return self._analysis('sources', compute)
 
     def mergeSingleSuccessorBlocks(self):
         assert(not self.procs) # Make sure that all single jsr procs are inlined first
 
-        replace = {}
+        replace = {} #union find of phi vars removed by merging, to the vars replacing them
+
         removed = set()
-        sources = self._getSources()
         for block in self.blocks:
             if block in removed:
                 continue
@@ -172,17 +275,17 @@ class SSA_Graph(object):
                 if isinstance(block.jump, ssa_jumps.OnException):
                     break
 
-                #We don't bother modifying sources upon merging since the only property we care about is number of successors, which will be unchanged
+                #The predecessor lists are kept up to date as blocks are merged, so there's no need to
+                #compute the sources of every block up front
                 child, jtype = successors.pop()
-                if len(sources[child]) != 1:
+                if len({pred for pred, _ in child.predecessors}) != 1:
                     break
 
                 #We've decided to merge the blocks, now do it
                 block.unaryConstraints.update(child.unaryConstraints)
                 for phi in child.phis:
                     assert(len(phi.dict) == 1)
-                    old, new = phi.rval, phi.get((block, jtype))
-                    new = replace.get(new,new)
+                    old, new = phi.rval, graph_util.findRoot(replace, phi.get((block, jtype)))
                     replace[old] = new
 
                     uc1 = block.unaryConstraints[old]
@@ -205,17 +308,60 @@ class SSA_Graph(object):
                     successor.replacePredPair((child,t), (block,t))
                 removed.add(child)
         self.blocks = [b for b in self.blocks if b not in removed]
-        #Fix up replace dict so it can handle multiple chained replacements
-        for old in replace.keys()[:]:
-            while replace[old] in replace:
-                replace[old] = replace[replace[old]]
         if replace:
+            #Only rewrite the ops which actually use one of the removed vars
+            replace = {old:graph_util.findRoot(replace, old) for old in replace}
             for block in self.blocks:
-                for op in block.phis + block.lines:
-                    op.replaceVars(replace)
-                block.jump.replaceVars(replace)
+                for phi in block.phis:
+                    if any(var in replace for var in phi.dict.itervalues()):
+                        phi.replaceVars(replace)
+                for op in block.lines + [block.jump]:
+                    if any(var in replace for var in op.params):
+                        op.replaceVars(replace)
+
+        if removed:
+            self._changed()
+        return bool(removed)
+
+    def propagateConstants(self):
+        #Sparse conditional constant propagation. This is much cheaper than constraintPropagation, so
+        #it's run first to fold constants and prune branches which are never taken, such as opaque
+        #predicates, before the later passes have to deal with them
+        assert(not self.procs)
+        reachable, liveEdges, values = sccp.findConstants(self)
+        changed = False
+        for block in self.blocks:
+            if block not in reachable:
+                continue #removed by condenseBlocks below
+
+            for var in block.unaryConstraints:
+                val = values.get(var)
+                if var.origin is not None and val is not None and val is not sccp.OVERDEFINED:
+                    var.origin.removeOutput(var)
+                    var.origin = None
+                    var.const = val.min if var.type[0] == 'int' else 'null'
+                    block.unaryConstraints[var] = val
+                    changed = True
+            block.phis = [phi for phi in block.phis if phi.rval is not None]
+
+            pairs = block.jump.getSuccessorPairs()
+            dead = [pair for pair in ODict.fromkeys(pairs) if (block, pair) not in liveEdges]
+            #If there are no live successors, the jump is never reached, so just leave it
+            newjump = block.jump.reduceSuccessors(dead) if dead and len(dead) < len(set(pairs)) else None
+            if newjump is not None:
+                block.jump = newjump
+                for (child,t) in dead:
+                    child.removePredPair((block,t))
+                changed = True
+
+        if changed:
+            self._changed()
+        changed = self.condenseBlocks() or changed
+        self._conscheck()
+        return changed
 
     def disconnectConstantVariables(self):
+        changed = False
         for block in self.blocks:
             for var, uc in block.unaryConstraints.items():
                 if var.origin is not None:
@@ -231,11 +377,18 @@ class SSA_Graph(object):
                         var.origin.removeOutput(var)
                         var.origin = None
                         var.const = newval
+                        changed = True
             block.phis = [phi for phi in block.phis if phi.rval is not None]
+
+        if changed:
+            self._changed()
         self._conscheck()
+        return changed
 
     def _conscheck(self):
         '''Sanity check'''
+        if not CHECK_CONSISTENCY:
+            return
         sources = self._getSources()
         for block in self.blocks:
             assert(sources[block] == {k for k,t in block.predecessors})
@@ -252,8 +405,12 @@ class SSA_Graph(object):
         #Assumes there are no subprocedues and this has not been called yet
         assert(not self.procs)
 
-        graph = variablegraph.makeGraph(self.env, self.blocks)
+        #In a reducible graph, every cycle of variables passes through a phi in a loop header, so the
+        #other phis don't need to be widened
+        widenBlocks = set(self.loopForest()[0]) if self.isReducible() else None
+        graph = variablegraph.makeGraph(self.env, self.blocks, widenBlocks)
         variablegraph.processGraph(graph)
+        changed = False
         for block in self.blocks:
             for var, oldUC in block.unaryConstraints.items():
                 newUC = graph[var].output[0]
@@ -267,10 +424,16 @@ class SSA_Graph(object):
                         var.origin = None
                     var.name = "UNREACHABLE" #for debug printing
                     # var.name += '-'
+                    changed = True
                 else:
                     newUC = constraints.join(oldUC, newUC)
                     block.unaryConstraints[var] = newUC
+                    changed = changed or newUC != oldUC
+
+        if changed:
+            self._changed()
         self._conscheck()
+        return changed
 
     def simplifyJumps(self):
         self._conscheck()
@@ -283,11 +446,13 @@ class SSA_Graph(object):
                         return True
             return False
 
+        changed = False
         for block in self.blocks:
             if usesInvalidVar(block):
                 for (child,t) in block.jump.getSuccessorPairs():
                     child.removePredPair((block,t))
                 block.jump = None
+                changed = True
 
         #Determine if any jumps are impossible based on known constraints of params: if(0 == 0) etc
         for block in self.blocks:
@@ -295,7 +460,9 @@ class SSA_Graph(object):
                 assert(block.jump.params)
                 oldEdges = block.jump.getSuccessorPairs()
                 UCs = map(block.unaryConstraints.get, block.jump.params)
+                oldJump = block.jump
                 block.jump = block.jump.constrainJumps(*UCs)
+                changed = changed or block.jump is not oldJump
 
                 if block.jump is None:
                     #This block has no valid successors, meaning it must be unreachable
@@ -304,6 +471,7 @@ class SSA_Graph(object):
 
                 newEdges = block.jump.getSuccessorPairs()
                 if newEdges != oldEdges:
+                    changed = True
                     pruned = [x for x in oldEdges if x not in newEdges]
                     for (child,t) in pruned:
                         child.removePredPair((block,t))
@@ -318,17 +486,34 @@ class SSA_Graph(object):
                     continue
 
                 badpairs = [(child,t) for child,t in block.jump.getSuccessorPairs() if child in badblocks]
+                if badpairs:
+                    changed = True
                 block.jump = block.jump.reduceSuccessors(badpairs)
                 if block.jump is None:
                     newbad.add(block)
             badblocks, newbad = newbad, set()
 
-        self.condenseBlocks()
+        if changed:
+            self._changed()
+        changed = self.condenseBlocks() or changed
         self._conscheck()
+        return changed
 
     # Subprocedure stuff #####################################################
     def _copyVar(self, var): return copy.copy(var)
 
+    def _getProcRegion(self, proc):
+        #Blocks from the proc target to the ret block, in topological order
+        callblocks = proc.callops.values()
+        ftblocks = [callop.fallthrough for callop in proc.callops]
+        target = proc.target
+        getpreds = lambda block:(zip(*block.predecessors)[0] if block.predecessors and block != target else [])
+        region = graph_util.topologicalSort([proc.retblock], getpreds)
+        assert(target in region and proc.retblock in region)
+        assert(self.entryBlock not in region)
+        assert(not any(block in region for block in callblocks + ftblocks))
+        return region
+
     def _splitSubProc(self, proc):
         #Splits a proc into two, with one callsite using the new proc instead
         #this involved duplicating the body of the procedure
@@ -336,12 +521,7 @@ class SSA_Graph(object):
         callop, callblock = proc.callops.items()[0]
         retblock, retop = proc.retblock, proc.retop
         target = proc.target
-        ftblock = callop.fallthrough
-
-        getpreds = lambda block:(zip(*block.predecessors)[0] if block.predecessors and block != target else [])
-        region = graph_util.topologicalSort([retblock], getpreds)
-        assert(target in region and retblock in region and callblock not in region and ftblock not in region)
-        assert(self.entryBlock not in region)
+        region = self._getProcRegion(proc)
 
         varmap = {}
         blockmap = {}
@@ -416,15 +596,11 @@ class SSA_Graph(object):
         retblock, retop = proc.retblock, proc.retop
         target = proc.target
         ftblock = callop.fallthrough
-
-        getpreds = lambda block:(zip(*block.predecessors)[0] if block.predecessors and block != target else [])
-        region = graph_util.topologicalSort([retblock], getpreds)
-        assert(target in region and retblock in region and callblock not in region and ftblock not in region)
-        assert(self.entryBlock not in region)
+        region = self._getProcRegion(proc)
 
         #first we find any vars that bypass the proc since we have to pass them through the new blocks
         skipvars = [phi.get((callblock,False)) for phi in callop.fallthrough.phis]
-        skipvars = [var for var in skipvars if var.origin is not callop]
+        skipvars = ODict.fromkeys(var for var in skipvars if var.origin is not callop).keys() #a var may be in several slots
 
         svarcopy = {(var, block):self._copyVar(var) for var, block in itertools.product(skipvars, region)}
         for var, block in itertools.product(skipvars, region):
@@ -435,6 +611,7 @@ class SSA_Graph(object):
                 vals = {k:svarcopy[var, k[0]] for k in block.predecessors}
             rval = svarcopy[var, block]
             rval.origin = phi = ssa_ops.Phi(self, block, vals, rval)
+            self._slotKeys[rval] = target, var
             block.phis.append(phi)
             block.unaryConstraints[rval] = callblock.unaryConstraints[var]
 
@@ -450,6 +627,98 @@ class SSA_Graph(object):
         for phi in ftblock.phis:
             phi.replaceVars(outreplace)
 
+    def _routeThroughProc(self, region, target, incoming, template, key):
+        #Adds phis to carry a value through the proc region, from the given callblocks to the ret
+        #block. Other paths into the proc never use the value, so they just pass a dummy constant
+        copies = {}
+        for block in region:
+            var = copies[block] = self._copyVar(template)
+            var.const = None
+            block.unaryConstraints[var] = constraints.fromVariable(self.env, var)
+            self._slotKeys[var] = target, key
+
+        for block in region:
+            vals = {}
+            for pair in block.predecessors:
+                pred = pair[0]
+                if pred in copies:
+                    vals[pair] = copies[pred]
+                elif pred in incoming:
+                    vals[pair] = incoming[pred]
+                else:
+                    assert(block == target)
+                    dummy = self.makeVariable(template.type)
+                    dummy.const = _dummyConsts[template.type]
+                    if template.type == SSA_OBJECT:
+                        dummy.decltype = objtypes.NullTT
+                    pred.unaryConstraints[dummy] = constraints.fromVariable(self.env, dummy)
+                    vals[pair] = dummy
+            rval = copies[block]
+            rval.origin = phi = ssa_ops.Phi(self, block, vals, rval)
+            block.phis.append(phi)
+        return copies
+
+    def _shareSubProc(self, proc):
+        #Makes all callsites share a single copy of the proc. Each callsite passes a distinct
+        #constant through the proc, and the ret becomes a switch on it back to the callsite
+        callitems = proc.callops.items()
+        retblock, retop = proc.retblock, proc.retop
+        target = proc.target
+        region = self._getProcRegion(proc)
+
+        #The constant for each callsite is known, so there's no need to copy it, just the type
+        template = self.makeVariable(SSA_INT)
+        consts = {}
+        for i, (callop, callblock) in enumerate(callitems):
+            consts[callblock] = const = self.makeVariable(SSA_INT)
+            const.const = i
+            callblock.unaryConstraints[const] = constraints.fromVariable(self.env, const)
+        retaddr = self._routeThroughProc(region, target, consts, template, 'ra')[retblock]
+
+        #Vars that bypass the proc have to be passed through it. If the slot is still valid at the
+        #ret, the proc didn't touch it, so its value there can be used. Otherwise the callsites share
+        #a single path per slot, since routing each var separately would double the number of paths
+        #with each level of nesting
+        skipcopies = {}
+        skipped = ODict()
+        for callop, callblock in callitems:
+            for phi in callop.fallthrough.phis:
+                var = phi.get((callblock, False))
+                if var.origin is callop:
+                    continue
+                key = self._slotKeys.get(phi.rval, phi)
+                if key in retop.input:
+                    skipcopies[callblock, var] = retop.input[key]
+                else:
+                    skipped.setdefault((key, var.type), ODict())[callblock] = var
+
+        for (key, _), sources in skipped.items():
+            template = sources.values()[0]
+            if len({var.decltype for var in sources.values()}) > 1:
+                template = self._copyVar(template)
+                template.decltype = None #callsites disagree on the type, so just use Object
+            copy = self._routeThroughProc(region, target, sources, template, key)[retblock]
+            for callblock, var in sources.items():
+                skipcopies[callblock, var] = copy
+
+        table = []
+        for i, (callop, callblock) in enumerate(callitems):
+            ftblock = callop.fallthrough
+            outreplace = {var:copy for (cb, var), copy in skipcopies.items() if cb == callblock}
+            for k, v in callop.out.items():
+                outreplace[v] = retop.input[k]
+                del callblock.unaryConstraints[v]
+
+            callblock.jump = ssa_jumps.Goto(self, target)
+            ftblock.replacePredPair((callblock, False), (retblock, False))
+            for phi in ftblock.phis: #only the value from the callsite changes
+                var = phi.get((retblock, False))
+                phi.dict[retblock, False] = outreplace.get(var, var)
+            table.append((i, ftblock))
+
+        default = table.pop()[1]
+        retblock.jump = ssa_jumps.Switch(self, default, table, [retaddr])
+
     def inlineSubprocs(self):
         self._conscheck()
         if not self.procs:
@@ -472,16 +741,36 @@ class SSA_Graph(object):
 
         self.procs = graph_util.topologicalSort(self.procs, parents.get)
         if any(parents.values()):
-            print 'Warning, nesting subprocedures detected! This method may take forever to decompile.'
+            print 'Nested subprocedures detected'
 
-        #now inline the procs
+        #now inline the procs, starting with the innermost, until the clone limit is reached
+        cloned = 0
         while self.procs:
             proc = self.procs.pop()
             while len(proc.callops) > 1:
+                instrument.checkBudget()
+                cloned += len(self._getProcRegion(proc))
+                if cloned > SUBPROC_CLONE_LIMIT:
+                    break
                 print 'splitting', proc
                 self._splitSubProc(proc)
+            if len(proc.callops) > 1:
+                self.procs.append(proc)
+                break
             print 'inlining', proc
             self._inlineSubProc(proc)
+
+        #Any procs left are shared rather than copied. This has to be done from the outermost
+        #in, so that the region of each proc is still confined to its own body
+        if self.procs:
+            print 'Subprocedure clone limit reached, sharing {} procs'.format(len(self.procs))
+        for proc in self.procs:
+            instrument.checkBudget()
+            if len(proc.callops) > 1:
+                self._shareSubProc(proc)
+            else:
+                self._inlineSubProc(proc)
+        self.procs = []
         self._conscheck()
     ##########################################################################
 
@@ -521,6 +810,9 @@ class SSA_Graph(object):
     def getConstPoolType(self, index):
         return self.class_.cpool.getType(index)
 
+    def makeCatchSetManager(self, chpairs):
+        return CatchSetManager.make(self.env, chpairs, self._catchSets)
+
     def rawExceptionHandlers(self):
         rethrow_handler = (0, self.code.codelen, self.rethrowKey, 0)
         return self.code.except_raw + [rethrow_handler]
@@ -542,9 +834,12 @@ def ssaFromVerified(code, iNodes):
             initMap[node.push_type] = node.target_type
     initMap[verifier_types.T_UNINIT_THIS] = verifier_types.T_OBJECT(code.class_.name)
 
-    blocks = [blockmaker.fromInstruction(parent, iNode, initMap) for iNode in iNodes if iNode.visited]
+    live = blockmaker.liveLocals(iNodes, code.except_raw)
+    blocks = blockmaker.makeBlocks(parent, iNodes, initMap, code.except_raw, live)
     blocks = [parent.entryBlock] + blocks + [parent.returnBlock, parent.rethrowBlock]
     blockDict = {b.key:b for b in blocks}
+    #Blocks are keyed by their first instruction, so rets have to be looked up separately
+    retDict = {b.jump.iNode.key:b for b in blocks if isinstance(b.jump, subproc.DummyRet)}
 
     #fixup proc info
     jsrs = [block for block in blocks if isinstance(block.jump, subproc.ProcCallOp)]
@@ -552,7 +847,7 @@ def ssaFromVerified(code, iNodes):
     for block in jsrs:
         target = blockDict[block.jump.iNode.successors[0]]
         callop = block.jump
-        retblock = blockDict[block.jump.iNode.returnedFrom]
+        retblock = retDict[block.jump.iNode.returnedFrom]
         retop = retblock.jump
         assert(isinstance(callop, subproc.ProcCallOp))
         assert(isinstance(retop, subproc.DummyRet))
@@ -576,7 +871,7 @@ def ssaFromVerified(code, iNodes):
         #The successor state uses the merged locals so it gets skipvars
         zipped = itertools.izip_longest(newlocals, jsrslots.locals, fillvalue=None)
         mask = [mask for entry,mask in retop.iNode.masks if entry == target.key][0]
-        merged = [(x if i in mask else y) for i,(x,y) in enumerate(zipped)]
+        merged = [(x if mask >> i & 1 else y) for i,(x,y) in enumerate(zipped)]
         merged_slots = slots_t(monad=newmonad, locals=merged, stack=newstack)
 
         block.successorStates[callop.iNode.next_instruction, False] = merged_slots
@@ -615,6 +910,7 @@ def ssaFromVerified(code, iNodes):
         del block.successorStates
 
     #create phi functions for input variables
+    ftblocks = set(callop.fallthrough for proc in procs for callop in proc.callops)
     for block in blocks:
         if block is parent.entryBlock:
             block.phis = []
@@ -631,6 +927,9 @@ def ssaFromVerified(code, iNodes):
             if v is not None:
                 v.origin = makePhiFromODict(parent, block, v, block.sourceStates, (lambda i: i.locals[k]))
                 assert(v.origin.rval is v)
+        if block in ftblocks:
+            for k, v in subproc.slotsToDict(ins).items():
+                parent._slotKeys[v] = k
 
         del block.sourceStates, block.inslots
         phivars = [ins.monad] + ins.stack + ins.locals
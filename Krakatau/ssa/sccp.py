@@ -0,0 +1,128 @@
+import collections
+
+from . import ssa_jumps, ssa_ops
+from .constraints import IntConstraint, ObjectConstraint, fromVariable
+from .. import instrument
+
+#Sparse conditional constant propagation. Values form a three level lattice: variables with no
+#value yet (not in the dict) may be anything, since they haven't been reached, OVERDEFINED ones may
+#have more than one value, and the rest have a single known value, given as a constraint so that the
+#ops can propagate them with their usual propagateConstraints
+OVERDEFINED = 'overdefined'
+
+def _constant(uc):
+    #Only integers and null can be turned into constant variables
+    if isinstance(uc, IntConstraint) and uc.min == uc.max:
+        return uc
+    if isinstance(uc, ObjectConstraint) and uc.isConstNull():
+        return uc
+    return OVERDEFINED
+
+def _meet(vals):
+    vals = [v for v in vals if v is not None]
+    if not vals:
+        return None
+    if OVERDEFINED in vals or any(v != vals[0] for v in vals[1:]):
+        return OVERDEFINED
+    return vals[0]
+
+def _liveSuccessors(jump, params):
+    if isinstance(jump, ssa_jumps.If):
+        return [pair for pair in jump.getSuccessorPairs() if None not in jump.getSuccessorConstraints(pair)(*params)]
+    elif isinstance(jump, ssa_jumps.Switch):
+        val = params[0].min
+        for block, keys in jump.reverse.items():
+            if val in keys:
+                return [(block, False)]
+        return [(jump.successors[0], False)] #default
+    return jump.getSuccessorPairs()
+
+def findConstants(graph):
+    '''Returns the set of reachable blocks, the set of (block, successor pair) edges which may be
+    taken, and the lattice value of each variable'''
+    env = graph.env
+    values = {}
+    uses = collections.defaultdict(list) #var -> (block, item, predecessor pair for phis)
+    for block in graph.blocks:
+        for phi in block.phis:
+            for pair in block.predecessors:
+                uses[phi.get(pair)].append((block, phi, pair))
+        for item in block.lines + [block.jump]:
+            for var in item.params:
+                uses[var].append((block, item, None))
+
+    def get(var):
+        if var not in values and var.origin is None: #constants and method arguments
+            values[var] = _constant(fromVariable(env, var)) if var.const is not None else OVERDEFINED
+        return values.get(var)
+
+    reachable, liveEdges = set(), set()
+    blockWork, itemWork = [graph.entryBlock], []
+    reachable.add(graph.entryBlock)
+
+    def setValue(var, val):
+        old = values.get(var)
+        if val is None or old is OVERDEFINED or old == val:
+            return
+        values[var] = val if old is None else OVERDEFINED
+        itemWork.extend(use for use in uses[var] if use[0] in reachable)
+
+    def markEdge(block, pair):
+        edge = block, pair
+        if edge in liveEdges:
+            return
+        liveEdges.add(edge)
+        child = pair[0]
+        if child not in reachable:
+            reachable.add(child)
+            blockWork.append(child)
+        else: #only the phis can see the new edge
+            itemWork.extend((child, phi, (block, pair[1])) for phi in child.phis)
+
+    def visit(block, item, pair=None):
+        if isinstance(item, ssa_ops.Phi):
+            #Values only move up the lattice, so phis can be updated incrementally, one input at a time.
+            #Otherwise blocks with many predecessors, such as exception handlers, would take quadratic time
+            if pair is None:
+                vals = [get(item.get(k)) for k in block.predecessors if (k[0], (block, k[1])) in liveEdges]
+            elif (pair[0], (block, pair[1])) in liveEdges:
+                vals = values.get(item.rval), get(item.get(pair))
+            else:
+                return
+            setValue(item.rval, _meet(vals))
+            return
+
+        params = [get(var) for var in item.params]
+        if item is block.jump:
+            if isinstance(item, ssa_jumps.OnException):
+                #If the exception is never defined, the op can't throw
+                pairs = item.getSuccessorPairs() if params[0] is not None else [(x, False) for x in item.getNormalSuccessors()]
+            elif None in params:
+                return
+            elif OVERDEFINED in params:
+                pairs = item.getSuccessorPairs()
+            else:
+                pairs = _liveSuccessors(item, params)
+            for pair in pairs:
+                markEdge(block, pair)
+            return
+
+        if None in params:
+            return
+        if OVERDEFINED in params or not hasattr(item, 'propagateConstraints'):
+            results = [OVERDEFINED]*3
+        else:
+            results = [(None if uc is None else _constant(uc)) for uc in item.propagateConstraints(*params)]
+        for var, val in zip(item.getOutputs(), results):
+            if var is not None:
+                setValue(var, val)
+
+    while blockWork or itemWork:
+        instrument.checkBudget()
+        if itemWork:
+            visit(*itemWork.pop())
+        else:
+            block = blockWork.pop()
+            for item in block.phis + block.lines + [block.jump]:
+                visit(block, item)
+    return reachable, liveEdges, values
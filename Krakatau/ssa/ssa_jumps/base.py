@@ -2,6 +2,8 @@ from ..functionbase import SSAFunctionBase
 import copy
 
 class BaseJump(SSAFunctionBase):
+    __slots__ = ()
+
     def __init__(self, parent, arguments=()):
         super(BaseJump, self).__init__(parent,arguments)
 
@@ -1,9 +1,13 @@
 from .base import BaseJump
 
 class Return(BaseJump):
+    __slots__ = ()
+
     def __init__(self, parent, arguments):
         super(Return, self).__init__(parent, arguments)
 
 class Rethrow(BaseJump):
+    __slots__ = ()
+
     def __init__(self, parent, arguments):
         super(Rethrow, self).__init__(parent, arguments)
\ No newline at end of file
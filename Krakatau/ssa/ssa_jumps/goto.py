@@ -1,6 +1,8 @@
 from .base import BaseJump
 
 class Goto(BaseJump):
+    __slots__ = 'successors'.split()
+
     def __init__(self, parent, target):
         super(Goto, self).__init__(parent, [])
         self.successors = [target]
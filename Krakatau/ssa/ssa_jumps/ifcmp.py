@@ -4,6 +4,7 @@ from ..constraints import IntConstraint, ObjectConstraint
 from .goto import Goto
 
 class If(BaseJump):
+    __slots__ = 'cmp successors isObj'.split()
     opposites = {'eq':'ne', 'ne':'eq', 'lt':'ge', 'ge':'lt', 'gt':'le', 'le':'gt'}
 
     def __init__(self, parent, cmp, successors, arguments):
@@ -1,9 +1,11 @@
 from .base import BaseJump
 from .goto import Goto
-from ..exceptionset import  CatchSetManager, ExceptionSet
+from ..exceptionset import ExceptionSet
 from ..constraints import ObjectConstraint
 
 class OnException(BaseJump):
+    __slots__ = 'default cs'.split()
+
     def __init__(self, parent, key, line, rawExceptionHandlers, fallthrough=None):
         super(OnException, self).__init__(parent, [line.outException])
         self.default = fallthrough
@@ -13,29 +15,27 @@ class OnException(BaseJump):
             if start <= key < end:
                 catchtype = parent.getConstPoolArgs(index)[0] if index else 'java/lang/Throwable'
                 chpairs.append((catchtype, handler))
-        self.cs = CatchSetManager(parent.env, chpairs)
-        self.cs.pruneKeys()
+        self.cs = parent.makeCatchSetManager(chpairs)
 
     def replaceExceptTarget(self, old, new):
-        self.cs.replaceKeys({old:new})
+        self.cs = self.cs.replaceKeys({old:new})
 
     def replaceNormalTarget(self, old, new):
         self.default = new if self.default == old else self.default
 
     def replaceBlocks(self, blockDict):
-        self.cs.replaceKeys(blockDict)
+        self.cs = self.cs.replaceKeys(blockDict)
         if self.default is not None and self.default in blockDict:
             self.default = blockDict[self.default]
 
     def reduceSuccessors(self, pairsToRemove):
         for (child, t) in pairsToRemove:
-            if t:
-                self.cs.mask -= self.cs.sets[child]
-                del self.cs.sets[child]
-            else:
+            if not t:
                 self.replaceNormalTarget(child, None)
-                
-        self.cs.pruneKeys()
+        removed = [child for (child, t) in pairsToRemove if t]
+        if removed:
+            self.cs = self.cs.removeKeys(removed)
+
         if not self.cs.sets:
             if not self.default:
                 return None
@@ -48,18 +48,13 @@ class OnException(BaseJump):
     def getExceptSuccessors(self):
         return self.cs.sets.keys()
 
-    def clone(self): 
-        new = super(OnException, self).clone()
-        new.cs = self.cs.copy()
-        return new
-
     ###############################################################################
     def constrainJumps(self, x):
         if x is None:
             mask = ExceptionSet.EMPTY
         else:
-            mask = ExceptionSet(x.types.env, [(name,()) for name,dim in x.types.supers | x.types.exact])
-        self.cs.newMask(mask)
+            mask = ExceptionSet.make(x.types.env, [(name,()) for name,dim in x.types.supers | x.types.exact])
+        self.cs = self.cs.newMask(mask)
         return self.reduceSuccessors([])
 
     def getSuccessorConstraints(self, (block, t)):
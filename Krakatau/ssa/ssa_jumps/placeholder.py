@@ -1,5 +1,7 @@
 from .base import BaseJump
 
 class Placeholder(BaseJump):
+    __slots__ = ()
+
     def __init__(self, parent, *args, **kwargs):
         super(Placeholder, self).__init__(parent)
\ No newline at end of file
@@ -4,6 +4,8 @@ from .goto import Goto
 import collections
 
 class Switch(BaseJump):
+    __slots__ = 'successors reverse'.split()
+
     def __init__(self, parent, default, table, arguments):
         super(Switch, self).__init__(parent, arguments)
 
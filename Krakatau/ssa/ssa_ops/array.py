@@ -5,6 +5,8 @@ from .. import excepttypes
 from ..constraints import IntConstraint, FloatConstraint, ObjectConstraint, DUMMY
 
 class ArrLoad(BaseOp):
+    __slots__ = 'env ssatype'.split()
+
     def __init__(self, parent, args, ssatype, monad):
         super(ArrLoad, self).__init__(parent, [monad]+args, makeException=True)
         self.env = parent.env
@@ -38,6 +40,8 @@ class ArrLoad(BaseOp):
         return rout, eout, None
 
 class ArrStore(BaseOp):
+    __slots__ = 'env'.split()
+
     def __init__(self, parent, args, monad):
         super(ArrStore, self).__init__(parent, [monad]+args, makeException=True, makeMonad=True)
         self.env = parent.env
@@ -66,6 +70,8 @@ class ArrStore(BaseOp):
         return None, eout, DUMMY
 
 class ArrLength(BaseOp):
+    __slots__ = 'env outExceptionCons'.split()
+
     def __init__(self, parent, args):
         super(ArrLength, self).__init__(parent, args, makeException=True)
         self.env = parent.env
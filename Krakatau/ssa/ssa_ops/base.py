@@ -2,6 +2,8 @@ from ..functionbase import SSAFunctionBase
 from ..ssa_types import SSA_OBJECT, SSA_MONAD
 
 class BaseOp(SSAFunctionBase):
+    __slots__ = 'rval outException outMonad errorState'.split()
+
     def __init__(self, parent, arguments, makeException=False, makeMonad=False):
         super(BaseOp, self).__init__(parent,arguments)
 
@@ -3,6 +3,8 @@ from .. import objtypes, excepttypes, ssa_types
 from ..constraints import ObjectConstraint, IntConstraint
 
 class CheckCast(BaseOp):
+    __slots__ = 'env target_tt outExceptionCons'.split()
+
     def __init__(self, parent, target, args):
         super(CheckCast, self).__init__(parent,args, makeException=True)
         self.env = parent.env
@@ -17,6 +19,8 @@ class CheckCast(BaseOp):
         return None, None, None
 
 class InstanceOf(BaseOp):
+    __slots__ = 'env target_tt'.split()
+
     def __init__(self, parent, target, args):
         super(InstanceOf, self).__init__(parent,args)
         self.env = parent.env
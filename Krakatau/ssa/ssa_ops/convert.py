@@ -3,6 +3,8 @@ from ..constraints import IntConstraint, FloatConstraint
 from . import bitwise_util
 
 class Convert(BaseOp):
+    __slots__ = 'source target'.split()
+
     def __init__(self, parent, arg, source_ssa, target_ssa):
         super(Convert, self).__init__(parent, [arg])
         self.source = source_ssa
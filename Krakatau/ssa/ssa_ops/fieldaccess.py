@@ -16,6 +16,8 @@ _short_constraints = {
 _short_constraints[objtypes.BoolTT] = _short_constraints[objtypes.ByteTT]
 
 class FieldAccess(BaseOp):
+    __slots__ = 'instruction target name desc returned mout eout rout'.split()
+
     def __init__(self, parent, instr, info, args, monad):
         super(FieldAccess, self).__init__(parent, [monad]+args, makeException=True, makeMonad=True)
 
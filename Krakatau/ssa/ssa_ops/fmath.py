@@ -2,34 +2,41 @@ from .base import BaseOp
 from ..constraints import IntConstraint
 
 class FAdd(BaseOp):
+    __slots__ = ()
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
 class FDiv(BaseOp):
+    __slots__ = ()
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
 class FMul(BaseOp):
+    __slots__ = ()
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
 class FRem(BaseOp):
+    __slots__ = ()
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
 class FSub(BaseOp):
+    __slots__ = ()
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
 
 #Unary, unlike the others
 class FNeg(BaseOp):
+    __slots__ = ()
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
 
 from .. import ssa_types
 class FCmp(BaseOp):
+    __slots__ = 'NaN_val'.split()
     def __init__(self, parent, args, NaN_val):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(ssa_types.SSA_INT, origin=self)
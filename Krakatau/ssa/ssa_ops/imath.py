@@ -18,6 +18,8 @@ def getNewRange(w, zmin, zmax):
         return IntConstraint.range(w, (zmin % N)-HN, (zmax % N)-HN), None, None
 
 class IAdd(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         super(IAdd, self).__init__(parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -26,6 +28,8 @@ class IAdd(BaseOp):
         return getNewRange(x.width, x.min+y.min, x.max+y.max)
 
 class IMul(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         super(IMul, self).__init__(parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -35,6 +39,8 @@ class IMul(BaseOp):
         return getNewRange(x.width, min(vals), max(vals))
 
 class ISub(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         super(ISub, self).__init__(parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -44,6 +50,8 @@ class ISub(BaseOp):
 
 #############################################################################################
 class IAnd(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -52,6 +60,8 @@ class IAnd(BaseOp):
         return bitwise_util.propagateAnd(x,y), None, None
 
 class IOr(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -60,6 +70,8 @@ class IOr(BaseOp):
         return bitwise_util.propagateOr(x,y), None, None
 
 class IXor(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -83,6 +95,8 @@ def getMaskedRange(x, bits):
     return m1, m2
 
 class IShl(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -97,6 +111,8 @@ class IShl(BaseOp):
         return IntConstraint.range(x.width, m1<<shift, m2<<shift), None, None
 
 class IShr(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -111,6 +127,8 @@ class IShr(BaseOp):
         return IntConstraint.range(x.width, m1>>shift, m2>>shift), None, None
 
 class IUshr(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -137,6 +155,8 @@ class IUshr(BaseOp):
 #############################################################################################
 exec_tts = ('java/lang/ArithmeticException', 0),
 class IDiv(BaseOp):
+    __slots__ = 'outExceptionCons'.split()
+
     def __init__(self, parent, args):
         super(IDiv, self).__init__(parent, args, makeException=True)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -173,6 +193,8 @@ class IDiv(BaseOp):
         return rvalcons, excons, None
 
 class IRem(BaseOp):
+    __slots__ = 'outExceptionCons'.split()
+
     def __init__(self, parent, args):
         super(IRem, self).__init__(parent, args, makeException=True)
         self.rval = parent.makeVariable(args[0].type, origin=self)
@@ -198,6 +220,8 @@ class IRem(BaseOp):
 
 ###############################################################################
 class ICmp(BaseOp):
+    __slots__ = ()
+
     def __init__(self, parent, args):
         BaseOp.__init__(self, parent, args)
         self.rval = parent.makeVariable(ssa_types.SSA_INT, origin=self)
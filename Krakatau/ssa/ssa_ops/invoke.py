@@ -6,6 +6,8 @@ from .. import objtypes, constraints
 from ..constraints import ObjectConstraint
 
 class Invoke(BaseOp):
+    __slots__ = 'instruction target name desc isThisCtor returned mout eout rout'.split()
+
     def __init__(self, parent, instr, info, args, monad, isThisCtor):
         super(Invoke, self).__init__(parent, [monad]+args, makeException=True, makeMonad=True)
 
@@ -3,6 +3,8 @@ from .. import excepttypes
 from ..constraints import ObjectConstraint, DUMMY
 
 class Monitor(BaseOp):
+    __slots__ = 'exit env'.split()
+
     def __init__(self, parent, args, monad, isExit):
         BaseOp.__init__(self, parent, [monad]+args, makeException=True, makeMonad=True)
         self.exit = isExit
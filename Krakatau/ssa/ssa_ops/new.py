@@ -5,6 +5,8 @@ from .. import excepttypes
 from ..constraints import ObjectConstraint, IntConstraint, DUMMY
 
 class New(BaseOp):
+    __slots__ = 'tt env'.split()
+
     def __init__(self, parent, name, monad):
         super(New, self).__init__(parent, [monad], makeException=True, makeMonad=True)
         self.tt = name,0
@@ -17,6 +19,8 @@ class New(BaseOp):
         return rout, eout, DUMMY
 
 class NewArray(BaseOp):
+    __slots__ = 'baset tt env'.split()
+
     def __init__(self, parent, param, baset, monad):
         super(NewArray, self).__init__(parent, [monad, param], makeException=True, makeMonad=True)
         self.baset = baset
@@ -41,6 +45,8 @@ class NewArray(BaseOp):
         return rout, eout, DUMMY
 
 class MultiNewArray(BaseOp):
+    __slots__ = 'tt env'.split()
+
     def __init__(self, parent, params, type_, monad):
         super(MultiNewArray, self).__init__(parent, [monad] + params, makeException=True, makeMonad=True)
         self.tt = type_
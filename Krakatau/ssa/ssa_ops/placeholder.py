@@ -1,6 +1,8 @@
 from .base import BaseOp
 
 class Placeholder(BaseOp):
+    __slots__ = 'returned'.split()
+
     def __init__(self, parent, *args, **kwargs):
         super(Placeholder, self).__init__(parent, [])
 
@@ -3,6 +3,8 @@ from .. import excepttypes
 from ..constraints import ObjectConstraint
 
 class Throw(BaseOp):
+    __slots__ = 'env'.split()
+
     def __init__(self, parent, args):
         super(Throw, self).__init__(parent, args, makeException=True)
         self.env = parent.env
@@ -3,6 +3,8 @@ from ..constraints import IntConstraint
 from . import bitwise_util
 
 class Truncate(BaseOp):
+    __slots__ = 'signed width'.split()
+
     def __init__(self, parent, arg, signed, width):
         super(Truncate, self).__init__(parent, [arg])
 
@@ -3,6 +3,8 @@ from .. import excepttypes
 from ..constraints import ObjectConstraint
 
 class TryReturn(BaseOp):
+    __slots__ = 'outExceptionCons'.split()
+
     def __init__(self, parent, monad):
         super(TryReturn, self).__init__(parent, [monad], makeException=True)
         self.outExceptionCons = ObjectConstraint.fromTops(parent.env, [], (excepttypes.MonState,), nonnull=True)
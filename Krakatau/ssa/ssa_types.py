@@ -30,6 +30,8 @@ def verifierToSSAType(vtype):
     return None
 
 class BasicBlock(object):
+    __slots__ = 'key phis lines jump unaryConstraints predecessors target sourceStates successorStates inslots tempvars'.split()
+
     def __init__(self, key, lines, jump):
         self.key = key
         # The list of phi statements merging incoming variables
@@ -1,16 +1,24 @@
 import collections, itertools
 
-from .constraints import join, meet
-from .. import graph_util
+from .constraints import join, meet, widen
+from .ssa_types import SSA_INT
+from .. import graph_util, instrument
 #UC = unary constraints
 
+#Number of times a phi's optimistic range may grow before it is widened
+WIDEN_DELAY = 1
+#Number of times each node may be refined after widening
+NARROW_LIMIT = 2
+
 class BaseNode(object):
     def __init__(self, processfunc, isphi, filterNone=True):
         assert(processfunc is not None)
         self.sources = []
         self.uses = []
         self.process = processfunc
-        self.iters = self.upIters = 0
+        self.iters = self.upIters = self.narrowIters = 0
+        self.isphi = self.widenPoint = isphi
+        self.widened = False
         self.propagateInvalid = not isphi
         self.filterNone = filterNone
         self.upInvalid = False
@@ -29,7 +37,7 @@ class BaseNode(object):
             new = tuple(join(oldv, newv) for oldv, newv in zip(self.output, new))
         return new
 
-    def update(self, iterlimit):
+    def update(self, iterlimit, thresholds=()):
         if not self.sources:
             assert(self.output == self.upOutput)
             return False
@@ -45,6 +53,14 @@ class BaseNode(object):
         if self.upIters < iterlimit:
             self.upInvalid = False
             new = self._propagate([node.upOutput[key] for node,key in self.sources])
+            if self.widenPoint and self.upIters >= WIDEN_DELAY and new != self.upOutput:
+                #Every cycle passes through a phi, so widening them is enough to make the optimistic
+                #bounds converge. Thresholds are skipped on the last iteration to give it the best chance
+                if self.upIters >= iterlimit - 1:
+                    thresholds = ()
+                widened = tuple(join(x, widen(oldv, newv, thresholds)) for x, oldv, newv in zip(self.output, self.upOutput, new))
+                self.widened = self.widened or widened != new
+                new = widened
             if new != self.upOutput:
                 self.upOutput = new
                 #don't increase upiters if changed was possibly due to change in lower bound
@@ -55,6 +71,19 @@ class BaseNode(object):
                     node.upInvalid = True
         return changed
 
+    def narrow(self):
+        #Refines the optimistic bounds after widening. Since they're already a fixed point, they stay
+        #valid however many steps are taken, as long as they only shrink
+        if not self.sources or self.narrowIters >= NARROW_LIMIT:
+            return False
+        new = self._propagate([node.upOutput[key] for node,key in self.sources])
+        new = tuple(join(oldv, newv) for oldv, newv in zip(self.upOutput, new))
+        if new == self.upOutput:
+            return False
+        self.upOutput = new
+        self.narrowIters += 1
+        return True
+
 def registerUses(use, sources):
     for node,index in sources:
         node.uses.append(use)
@@ -80,7 +109,8 @@ def getJumpNode(pair, source, var, getVarNode, jumplookup):
 
     return getVarNode(var), 0
 
-def makeGraph(env, blocks):
+def makeGraph(env, blocks, widenBlocks=None):
+    #widenBlocks is the set of blocks whose phis are widened. By default, all of them are
     lookup = collections.OrderedDict()
     jumplookup = {}
 
@@ -102,6 +132,7 @@ def makeGraph(env, blocks):
     for phi in phis:
         n = BaseNode(philamb, True)
         block = phi.block
+        n.widenPoint = widenBlocks is None or block in widenBlocks
         for (source, exc) in block.predecessors:
             n.sources.append(getJumpNode((block, exc), source, phi.get((source, exc)), lookup.get, jumplookup))
         registerUses(n, n.sources)
@@ -148,20 +179,37 @@ def makeGraph(env, blocks):
             assert(node in zip(*use.sources)[0])
     return lookup
 
+def getThresholds(graph):
+    #Loop bounds are usually constants in the method, so widening stops at them (and their neighbors,
+    #for inclusive and exclusive comparisons) before giving up on a bound entirely
+    vals = set()
+    for var in graph:
+        if var.const is not None and var.type[0] == SSA_INT[0]:
+            vals.update((var.const - 1, var.const, var.const + 1))
+    return tuple(sorted(vals))
+
 def processGraph(graph, iterlimit=5):
     sccs = graph_util.tarjanSCC(graph.values(), lambda node:[t[0] for t in node.sources])
     #iterate over sccs in topological order to improve convergence
+    thresholds = getThresholds(graph)
 
     for scc in sccs:
         worklist = list(scc)
         while worklist:
+            instrument.checkBudget()
             node = worklist.pop(0)
-            changed = node.update(iterlimit)
+            changed = node.update(iterlimit, thresholds)
             if changed:
                 worklist.extend(use for use in node.uses if use in scc and use not in worklist)
 
         #check if optimistic upperbounds converged
         converged = all((not node.upInvalid or node.output == node.upOutput) for node in scc)
+        if converged and any(node.widened for node in scc):
+            worklist = list(scc)
+            while worklist:
+                node = worklist.pop(0)
+                if node.narrow():
+                    worklist.extend(use for use in node.uses if use in scc and use not in worklist)
         if converged:
             for node in scc:
                 node.output = node.upOutput
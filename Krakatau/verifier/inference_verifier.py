@@ -1,6 +1,7 @@
 import itertools
 
 from .. import error as error_types
+from .. import instrument
 from .. import opnames
 from .. import bytecode
 from .verifier_types import *
@@ -120,6 +121,10 @@ def vtype2Char(fi):
     return _vtypeMap.get(fi, 'A')
 
 class InstructionNode(object):
+    __slots__ = '''key code env class_ cpool instruction op visited changed offsetList
+        returnedFrom successors jsrTarget next_instruction isThisCtor local_ind local_tag parsed_desc protected
+        push_type target_type before after stack locals masks flags'''.split()
+
     #Difference from Hotspot: We use seperate variable for REACHED and change and flag CONSTRUCTED to or flag NOT_CONSTRUCTED
     NO_RETURN = 1<<0
     NEED_CONSTRUCTOR = 1<<1
@@ -561,28 +566,28 @@ class InstructionNode(object):
     def _updateLocals(self, swap):
         op = self.op
         newlocs = list(self.locals) #mutable copies
-        newmasks = list(self.masks)
+        masks = self.masks #tuple of (subroutine entry, bitset of locals modified), innermost call last
 
         # Hotspot does things a bit strangely due to optimizations, which
         # we don't really care about. So we save all the new bits and
         # apply them at the end
-        newbits = set()
+        newbits = 0
         if op in (opnames.STORE, opnames.LOAD):
             cat = 2 if self.instruction[1] in 'JD' else 1
             ind = self.instruction[2]
-            newbits.update(range(ind,ind+cat))
+            newbits |= ((1 << cat) - 1) << ind
 
             if op == opnames.STORE:
                 newlocs += [T_INVALID] * (ind+cat-len(newlocs))
                 #Get the values off the old stack, since they've been popped
                 newlocs[ind:ind+cat] = self.stack[-cat:]
         elif op in (opnames.IINC, opnames.RET):
-            newbits.add(self.instruction[1])
+            newbits |= 1 << self.instruction[1]
         elif op == opnames.JSR:
             target = self.instruction[1]
-            if newmasks and target in zip(*newmasks)[0]:
+            if any(entry == target for entry, _ in masks):
                 self.error('Recursive call to JSR')
-            newmasks.append((target, frozenset()))
+            masks += ((target, 0),)
 
         elif op in (opnames.INVOKEINIT, opnames.NEW):
             old, replace = swap[False], swap[True]
@@ -590,11 +595,13 @@ class InstructionNode(object):
             for i, val in enumerate(newlocs[:]):
                 if val == old:
                     newlocs[i] = replace
-                    newbits.add(i)
+                    newbits |= 1 << i
 
-        newmasks = [(addr,bits | newbits) for addr,bits in newmasks]
+        #Masks are shared between instructions until they actually change
+        if any(bits | newbits != bits for _, bits in masks):
+            masks = tuple((addr, bits | newbits) for addr, bits in masks)
         locals_ = tuple(newlocs) if newbits else self.locals
-        return locals_, tuple(newmasks)
+        return locals_, masks
 
     def _updateFlags(self, swap):
         flags = self.flags
@@ -684,13 +691,6 @@ class InstructionNode(object):
 
     def _mergeSingleSuccessor(self, other, newstate, iNodes, isException):
         newstack, newlocals, newmasks, newflags = newstate
-        if self.op in (opnames.RET, opnames.JSR):
-            # Note: In most cases, this will cause an error later
-            # as INVALID is not allowed on the stack after merging
-            # but if the stack is never merged afterwards, it's ok
-            newstack = tuple((T_INVALID if x.tag == '.new' else x) for x in newstack)
-            newlocals = tuple((T_INVALID if x.tag == '.new' else x) for x in newlocals)
-
         if self.op == opnames.RET and not isException:
             #Get the instruction before other
             off_i = self.offsetList.index(other.key)
@@ -702,17 +702,16 @@ class InstructionNode(object):
 
             if jsrnode.visited: #if not, skip for later
                 called = jsrnode.instruction[1]
-                newmasks = list(newmasks)
-                while newmasks and newmasks[-1][0] != called:
-                    newmasks.pop()
-                if not newmasks:
+                entries = [entry for entry, _ in newmasks]
+                if called not in entries:
                     self.error('Returning to jsr not in current call stack')
-                mask = newmasks.pop()[1]
+                depth = len(entries) - 1 - entries[::-1].index(called)
+                mask = newmasks[depth][1]
+                newmasks = newmasks[:depth]
 
                 #merge locals using mask
                 zipped = itertools.izip_longest(newlocals, jsrnode.locals, fillvalue=T_INVALID)
-                newlocals = tuple((x if i in mask else y) for i,(x,y) in enumerate(zipped))
-                newmasks = tuple(newmasks)
+                newlocals = tuple((x if mask >> i & 1 else y) for i,(x,y) in enumerate(zipped))
             else:
                 return
 
@@ -752,18 +751,19 @@ class InstructionNode(object):
                 other.changed = True
 
             #Merge Masks
-            last_match = -1
-            mergedmasks = []
-            for entry1, mask1 in other.masks:
-                for j,(entry2,mask2) in enumerate(newmasks):
-                    if j>last_match and entry1 == entry2:
-                        item = entry1, (mask1 | mask2)
-                        mergedmasks.append(item)
-                        last_match = j
-            newmasks = tuple(mergedmasks)
             if other.masks != newmasks:
-                other.masks = newmasks
-                other.changed = True
+                last_match = -1
+                mergedmasks = []
+                for entry1, mask1 in other.masks:
+                    for j,(entry2,mask2) in enumerate(newmasks):
+                        if j>last_match and entry1 == entry2:
+                            item = entry1, (mask1 | mask2)
+                            mergedmasks.append(item)
+                            last_match = j
+                newmasks = tuple(mergedmasks)
+                if other.masks != newmasks:
+                    other.masks = newmasks
+                    other.changed = True
 
             #Merge flags
             if other.flags != newflags:
@@ -782,6 +782,12 @@ class InstructionNode(object):
 
         newstate, swap = self._getNewState(iNodes)
         newstack, newlocals, newmasks, newflags = newstate
+        if self.op in (opnames.RET, opnames.JSR):
+            # Note: In most cases, this will cause an error later
+            # as INVALID is not allowed on the stack after merging
+            # but if the stack is never merged afterwards, it's ok
+            newstack = tuple((T_INVALID if x.tag == '.new' else x) for x in newstack)
+            newlocals = tuple((T_INVALID if x.tag == '.new' else x) for x in newlocals)
 
         successors = self.successors
         if self.op == opnames.JSR:
@@ -822,7 +828,7 @@ class InstructionNode(object):
             lines.append('Locals: ' + ', '.join(map(str, self.locals)))
             if self.masks:
                 lines.append('Masks:')
-                lines += ['\t{}: {}'.format(entry, sorted(cset)) for entry,cset in self.masks]
+                lines += ['\t{}: {}'.format(entry, [i for i in range(bits.bit_length()) if bits >> i & 1]) for entry,bits in self.masks]
         else:
             lines.append('\tunvisited')
         return '\n'.join(lines) + '\n'
@@ -878,6 +884,7 @@ def verifyBytecode(code):
         done = True
         for node in iNodes:
             if node.changed:
+                instrument.checkBudget()
                 node.update(iNodeLookup, exceptions)
                 done = False
     return iNodes
\ No newline at end of file
@@ -0,0 +1,95 @@
+'''Measures the memory taken by the objects the decompiler creates for each method.
+
+For each method, counts the live instances of Krakatau classes (including their attribute dicts, if
+any) at three points: once the SSA graph is built, once structuring has finished (when the graph,
+block proxies and structure tree are all alive), and once the AST is finished.
+'''
+import os, sys, gc
+
+# Note: If this script is moved, be sure to update this path.
+krakatau_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, krakatau_root)
+class_location = os.path.join(krakatau_root, 'tests', 'classes')
+
+import decompile, run, synthetic
+from Krakatau.environment import Environment
+from Krakatau.java import javamethod
+from Krakatau.java.reserved import reserved_identifiers
+
+def measure():
+    '''Returns the number and total size in bytes of live Krakatau objects'''
+    gc.collect()
+    count = size = 0
+    for obj in gc.get_objects():
+        if type(obj).__module__.startswith('Krakatau.'):
+            count += 1
+            size += sys.getsizeof(obj)
+            d = getattr(obj, '__dict__', None)
+            if d is not None:
+                size += sys.getsizeof(d)
+    return count, size
+
+def measureMethods(corpus, targets):
+    results = []
+    createAST = javamethod.astgen.createAST
+    def measuredCreateAST(*args):
+        points.append(measure())
+        return createAST(*args)
+
+    e = Environment()
+    for part in corpus.path + [corpus.stubdir]:
+        e.addToPath(part)
+    makeGraph = decompile.makeCallback([])
+    javamethod.astgen.createAST = measuredCreateAST
+    try:
+        with e:
+            for target in targets:
+                c = e.getClass(target)
+                fi = frozenset(reserved_identifiers).union(f.name for f in c.fields)
+                for m in c.methods:
+                    if m.code is None:
+                        continue
+                    points = []
+                    base = measure()
+                    graph = makeGraph(m)
+                    points.append(measure())
+                    tree = javamethod.generateAST(m, graph, fi)
+                    del graph
+                    points.append(measure())
+                    del tree
+                    if len(points) < 3: #no structuring, e.g. due to an exception
+                        continue
+                    deltas = [(n - base[0], s - base[1]) for n, s in points]
+                    results.append((u'{}.{}{}'.format(target, m.name, m.descriptor), m.code.codelen, deltas))
+    finally:
+        javamethod.astgen.createAST = createAST
+    return results
+
+if __name__== "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Measure the memory used by the objects created for each method')
+    parser.add_argument('-synthetic', action='append', default=[], help='Also measure a generated class, given as case:size (see synthetic.py)')
+    parser.add_argument('-top', type=int, default=10, help='Number of methods to show')
+    parser.add_argument('targets', nargs='*', help='Test classes to measure (default: all)')
+    args = parser.parse_args()
+
+    corpus = run.Corpus([class_location], [])
+    try:
+        targets = args.targets or list(corpus.names)
+        for spec in args.synthetic:
+            case, _, size = spec.partition(':')
+            name, source = synthetic.generate(case, int(size))
+            (_, data), = corpus.assemble(source)
+            corpus.addClass(name, data)
+            targets.append(name)
+        corpus.prepare(targets)
+        results = run.quiet(measureMethods, corpus, targets)
+    finally:
+        corpus.close()
+
+    totals = [tuple(sum(r[2][i][j] for r in results) for j in range(2)) for i in range(3)]
+    print '{} methods. Totals: SSA {} objects, {} bytes; structured {} objects, {} bytes; AST {} objects, {} bytes'.format(
+        len(results), *(totals[0] + totals[1] + totals[2]))
+    print '{:>10} {:>12} {:>12} {:>12}  {}'.format('codelen', 'SSA', 'structured', 'AST', 'method (bytes)')
+    for name, codelen, deltas in sorted(results, key=lambda r:-r[2][1][1])[:args.top]:
+        print '{:10} {:12} {:12} {:12}  {}'.format(codelen, deltas[0][1], deltas[1][1], deltas[2][1], name.encode('utf8'))
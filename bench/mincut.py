@@ -0,0 +1,67 @@
+'''Benchmark for the max flow used by structuring.completeScopes.
+
+Decompiles the test classes with the most deeply nested switches and loops and reports the
+time spent finding min vertex cuts. The standard library is located as in decompile.py.
+'''
+import os, sys, time
+
+# Note: If this script is moved, be sure to update this path.
+krakatau_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, krakatau_root)
+class_location = os.path.join(krakatau_root, 'tests', 'classes')
+
+import decompile
+from Krakatau.environment import Environment
+from Krakatau.java import javaclass, structuring
+
+default_targets = 'Switch', 'WhileLoops', 'ControlFlow', 'DoubleEdge', 'TryCatchTest'
+
+def benchmark(path, targets, repeat):
+    stats = {'calls':0, 'time':0.0}
+    mincut = structuring._FlowGraph.mincut
+    def timedMincut(*args):
+        start = time.time()
+        try:
+            return mincut(*args)
+        finally:
+            stats['calls'] += 1
+            stats['time'] += time.time() - start
+
+    structuring._FlowGraph.mincut = timedMincut
+    try:
+        start = time.time()
+        for _ in range(repeat):
+            e = Environment()
+            for part in path:
+                e.addToPath(part)
+            makeGraph = decompile.makeCallback([])
+            with e:
+                for target in targets:
+                    javaclass.generateAST(e.getClass(target), makeGraph).print_()
+        total = time.time() - start
+    finally:
+        structuring._FlowGraph.mincut = mincut
+
+    print '{} mincut calls in {:.3f} seconds ({:.1%} of {:.3f} seconds total)'.format(
+        stats['calls'], stats['time'], stats['time']/total, total)
+
+if __name__== "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the min vertex cut used during structuring')
+    parser.add_argument('-path',action='append',help='Semicolon seperated paths or jars to search when loading classes')
+    parser.add_argument('-nauto', action='store_true', help="Don't attempt to automatically locate the Java standard library.")
+    parser.add_argument('-n', type=int, default=5, help='Number of times to repeat')
+    parser.add_argument('targets', nargs='*', help='Test classes to decompile', default=default_targets)
+    args = parser.parse_args()
+
+    path = [class_location]
+    if not args.nauto:
+        found = decompile.findJRE()
+        if found:
+            path.append(found)
+        else:
+            print 'Unable to find the standard library'
+    if args.path:
+        for part in args.path:
+            path.extend(part.split(';'))
+    benchmark(path, args.targets, args.n)
@@ -0,0 +1,234 @@
+'''Benchmark suite for the decompiler, disassembler and assembler.
+
+Runs each tool over the test classes (and any extra directories of classes) a number of times and
+reports throughput, time per phase and peak memory use. Results can be saved as JSON and compared
+against a saved baseline to catch regressions.
+
+No JDK or standard library is needed. Any class referenced by the corpus which can't be found on
+the path is replaced by a generated stub, so timings don't depend on what happens to be installed.
+'''
+import os, sys, time, json, shutil, tempfile
+
+# Note: If this script is moved, be sure to update this path.
+krakatau_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, krakatau_root)
+class_location = os.path.join(krakatau_root, 'tests', 'classes')
+
+import decompile
+from Krakatau import binUnpacker, instrument
+from Krakatau.assembler import tokenize, parse, assembler, disassembler
+from Krakatau.classfile import ClassFile, get_cp_raw
+from Krakatau.environment import Environment
+from Krakatau.error import ClassLoaderError
+from Krakatau.java import javaclass
+
+#Superclasses for stubs, where it matters for verification and exception handling
+stub_supers = {
+    'java/lang/Throwable': 'java/lang/Object',
+    'java/lang/Exception': 'java/lang/Throwable',
+    'java/lang/Error': 'java/lang/Throwable',
+    'java/lang/RuntimeException': 'java/lang/Exception',
+}
+stub_interfaces = frozenset('''java/lang/CharSequence java/lang/Comparable java/lang/Iterable java/lang/Runnable
+    java/lang/Cloneable java/lang/Appendable java/lang/AutoCloseable java/io/Serializable java/io/Closeable
+    java/util/Collection java/util/List java/util/Set java/util/Map java/util/Iterator'''.split())
+
+def stubSuper(name):
+    if name in stub_supers:
+        return stub_supers[name]
+    if name.endswith('Exception'):
+        return 'java/lang/RuntimeException' if name.startswith('java/lang/') else 'java/lang/Exception'
+    if name.endswith('Error'):
+        return 'java/lang/Error'
+    return 'java/lang/Object'
+
+class _Quiet(object):
+    #Swallows the progress messages printed by the tools
+    def write(self, s): pass
+
+def quiet(func, *args):
+    old, sys.stdout = sys.stdout, _Quiet()
+    try:
+        return func(*args)
+    finally:
+        sys.stdout = old
+
+class Corpus(object):
+    def __init__(self, dirs, path):
+        self.files = []
+        for d in dirs:
+            self.files += sorted(os.path.join(d, f) for f in os.listdir(d) if f.endswith('.class'))
+        self.path = list(dirs) + path
+        self.stubdir = tempfile.mkdtemp(prefix='krakatau_bench')
+        self.lexer = tokenize.makeLexer()
+        self.parser = parse.makeParser(debug=0, write_tables=0)
+
+        self.names, self.data, self.sources = [], [], []
+        self.bytecodeSize = 0
+        for fname in self.files:
+            with open(fname, 'rb') as f:
+                data = f.read()
+            class_ = self.loadClass(data)
+            self.names.append(class_.name)
+            self.data.append(data)
+            self.bytecodeSize += sum(m.code.codelen for m in class_.methods if m.code is not None)
+            self.sources.append(disassembler.disassemble(class_))
+
+    def close(self):
+        shutil.rmtree(self.stubdir)
+
+    def loadClass(self, data):
+        class_ = ClassFile(binUnpacker.binUnpacker(data=data))
+        class_.loadElements(keepRaw=True)
+        return class_
+
+    def assemble(self, source):
+        trees = self.parser.parse('\n' + source + '\n', lexer=self.lexer)
+        return [assembler.assemble(tree, False, False, 'bench') for tree in trees]
+
+    def makeStub(self, name):
+        if name == 'java/lang/Object':
+            source = '.class public java/lang/Object\n.super java/lang/Object\n'
+        elif name in stub_interfaces:
+            source = '.class public interface abstract {}\n.super java/lang/Object\n'.format(name)
+        else:
+            source = '.class public {}\n.super {}\n'.format(name, stubSuper(name))
+        (_, data), = self.assemble(source)
+        if name == 'java/lang/Object':
+            #The assembler always writes a superclass, so clear it by hand
+            stream = binUnpacker.binUnpacker(data=data)
+            stream.get('>LHH')
+            get_cp_raw(stream)
+            offset = len(data) - stream.size() + 4 #skip access flags and this class
+            data = data[:offset] + '\0\0' + data[offset+2:]
+        self.addClass(name, data)
+
+    def addClass(self, name, data):
+        #Makes a class available for loading, without adding it to the corpus
+        path = os.path.join(self.stubdir, name + '.class')
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def decompile(self, targets):
+        e = Environment()
+        for part in self.path + [self.stubdir]:
+            e.addToPath(part)
+        makeGraph = decompile.makeCallback([])
+        with e:
+            for target in targets:
+                with instrument.scope('class', target):
+                    with instrument.phase('parse'):
+                        c = e.getClass(target)
+                    class_ast = javaclass.generateAST(c, makeGraph)
+                    with instrument.phase('print'):
+                        class_ast.print_()
+
+    def prepare(self, targets=None):
+        #Decompile everything once, creating stubs for any missing classes
+        for target in (self.names if targets is None else targets):
+            while 1:
+                try:
+                    quiet(self.decompile, [target])
+                    break
+                except ClassLoaderError as e:
+                    if e.type != 'ClassNotFoundException':
+                        raise
+                    self.makeStub(e.data)
+
+def timeit(func, *args):
+    start = time.time()
+    quiet(func, *args)
+    return time.time() - start
+
+def benchmark(corpus, repeat):
+    ops = {
+        'decompile': lambda: corpus.decompile(corpus.names),
+        'disassemble': lambda: [disassembler.disassemble(corpus.loadClass(data)) for data in corpus.data],
+        'assemble': lambda: [corpus.assemble(source) for source in corpus.sources],
+    }
+    results = {'classes':len(corpus.names), 'bytecode_bytes':corpus.bytecodeSize, 'repeat':repeat}
+
+    for name in sorted(ops):
+        #Only the decompiler is instrumented
+        recorder = instrument.start() if name == 'decompile' else None
+        try:
+            elapsed = sum(timeit(ops[name]) for _ in range(repeat)) / repeat
+        finally:
+            instrument.stop()
+        if recorder is not None:
+            results['phases'] = {k:v/repeat for k,v in recorder.phaseTotals.items()}
+        results[name] = {'time':elapsed,
+            'classes_per_s':len(corpus.names) / elapsed,
+            'bytes_per_s':corpus.bytecodeSize / elapsed}
+    results['peak_rss_kb'] = instrument.peakMemory()
+    return results
+
+def printResults(results):
+    print '{classes} classes, {bytecode_bytes} bytes of bytecode, {repeat} runs'.format(**results)
+    for name in ('decompile', 'disassemble', 'assemble'):
+        print '{:12} {:8.3f}s {:8.1f} classes/s {:10.0f} bytes/s'.format(name, results[name]['time'],
+            results[name]['classes_per_s'], results[name]['bytes_per_s'])
+    print 'Decompilation phases:'
+    for name, t in sorted(results['phases'].items(), key=lambda t:-t[1]):
+        print '    {:40} {:8.3f}s'.format(name, t)
+    if results['peak_rss_kb'] is not None:
+        print 'Peak RSS: {} KB'.format(results['peak_rss_kb'])
+
+def compare(results, baseline, tolerance, mintime):
+    '''Returns a list of descriptions of measurements which regressed by more than tolerance'''
+    pairs = [(name, results[name]['time'], baseline[name]['time']) for name in ('decompile', 'disassemble', 'assemble')]
+    for name, t in results['phases'].items():
+        if name in baseline['phases']:
+            pairs.append(('phase ' + name, t, baseline['phases'][name]))
+    #Ignore measurements too short to time reliably
+    pairs = [t for t in pairs if max(t[1], t[2]) >= mintime]
+    if results['peak_rss_kb'] and baseline.get('peak_rss_kb'):
+        pairs.append(('peak RSS', results['peak_rss_kb'], baseline['peak_rss_kb']))
+
+    regressions = []
+    for name, new, old in pairs:
+        if new > old * (1 + tolerance):
+            regressions.append('{}: {:.3f} -> {:.3f} ({:+.1%})'.format(name, old, new, float(new)/old - 1))
+    return regressions
+
+if __name__== "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the decompiler, disassembler and assembler')
+    parser.add_argument('-path', action='append', help='Semicolon seperated paths or jars to search when loading classes')
+    parser.add_argument('-extra', action='append', default=[], help='Additional directory of classes to include in the corpus')
+    parser.add_argument('-n', type=int, default=3, help='Number of times to repeat')
+    parser.add_argument('-save', help='Write the results to this file as JSON')
+    parser.add_argument('-baseline', help='Compare against results previously saved with -save')
+    parser.add_argument('-tolerance', type=float, default=0.1, help='Fractional slowdown to report as a regression')
+    parser.add_argument('-mintime', type=float, default=0.05, help='Ignore timings shorter than this many seconds when comparing')
+    args = parser.parse_args()
+
+    path = []
+    if args.path:
+        for part in args.path:
+            path.extend(part.split(';'))
+
+    corpus = Corpus([class_location] + args.extra, path)
+    try:
+        corpus.prepare()
+        results = benchmark(corpus, args.n)
+    finally:
+        corpus.close()
+    printResults(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print 'Results written to', args.save
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.mintime)
+        if regressions:
+            print 'Regressions against', args.baseline
+            for line in regressions:
+                print '    ' + line
+            sys.exit(1)
+        print 'No regressions against', args.baseline
@@ -0,0 +1,220 @@
+'''Generates classes with pathological methods of controllable size, for measuring how the tools scale.
+
+Each case emits Krakatau assembly for a class whose size is determined by a single parameter, and
+assembles it with the Krakatau assembler. The classes can be written out to a directory (to use
+with run.py -extra), or decompiled directly to measure time against size.
+'''
+import os, sys, time, json
+
+# Note: If this script is moved, be sure to update this path.
+krakatau_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, krakatau_root)
+
+import run
+from Krakatau.assembler import disassembler
+
+def _method(name, desc, locals_, stack, body):
+    lines = ['.method public static {} : {}'.format(name, desc),
+        '    .limit locals {}'.format(locals_),
+        '    .limit stack {}'.format(stack)]
+    lines += body
+    lines.append('.end method')
+    return lines
+
+def tableswitch(n):
+    '''A tableswitch with n cases'''
+    body = ['    iload_0', '    tableswitch 0']
+    body += ['        L{}'.format(i) for i in range(n)]
+    body += ['        default : LD']
+    for i in range(n):
+        body += ['L{}:'.format(i), '    iload_0', '    sipush {}'.format(i % 32768), '    imul', '    ireturn']
+    body += ['LD:', '    iconst_m1', '    ireturn']
+    return _method('run', '(I)I', 1, 2, body)
+
+def lookupswitch(n):
+    '''A lookupswitch with n sparse cases'''
+    body = ['    iload_0', '    lookupswitch']
+    body += ['        {} : L{}'.format(i*7919, i) for i in range(n)]
+    body += ['        default : LD']
+    for i in range(n):
+        body += ['L{}:'.format(i), '    iload_0', '    sipush {}'.format(i % 32768), '    iadd', '    ireturn']
+    body += ['LD:', '    iconst_m1', '    ireturn']
+    return _method('run', '(I)I', 1, 2, body)
+
+def loops(n):
+    '''n counted loops nested inside each other'''
+    acc = n + 1
+    body = ['    iconst_0', '    istore {}'.format(acc)]
+    for i in range(1, n+1):
+        body += ['    iconst_0', '    istore {}'.format(i),
+            'LH{}:'.format(i), '    iload {}'.format(i), '    iload_0', '    if_icmpge LE{}'.format(i)]
+    body += ['    iinc {} 1'.format(acc)]
+    for i in reversed(range(1, n+1)):
+        body += ['    iinc {} 1'.format(i), '    goto LH{}'.format(i), 'LE{}:'.format(i)]
+    body += ['    iload {}'.format(acc), '    ireturn']
+    return _method('run', '(I)I', n+2, 2, body)
+
+def handlers(n):
+    '''n blocks which may throw, each covered by several of n overlapping exception handlers'''
+    width = 8
+    types = 'java/lang/ArithmeticException', 'java/lang/RuntimeException', 'java/lang/Throwable'
+    body = ['    iconst_1', '    istore_1']
+    for i in range(n):
+        body += ['L{}:'.format(i), '    iload_1', '    iload_0', '    idiv', '    istore_1']
+    body += ['L{}:'.format(n), '    iload_1', '    ireturn']
+    for i in range(n):
+        body += ['H{}:'.format(i), '    pop', '    sipush {}'.format(i % 32768), '    ireturn']
+    for i in range(n):
+        body += ['.catch {} from L{} to L{} using H{}'.format(types[i % 3], i, min(i+width, n), i)]
+    return _method('run', '(I)I', 2, 2, body)
+
+def jsrs(n):
+    '''Subroutines nested n deep, with each one calling the next from two different places'''
+    body = ['    jsr S0', '    iload_0', '    ireturn']
+    for i in range(n):
+        body += ['S{}:'.format(i), '    astore {}'.format(i+1)]
+        if i+1 < n:
+            body += ['    jsr S{}'.format(i+1), '    iinc 0 1', '    jsr S{}'.format(i+1)]
+        else:
+            body += ['    iinc 0 1']
+        body += ['    ret {}'.format(i+1)]
+    return _method('run', '(I)I', n+1, 1, body)
+
+def widejsrs(n):
+    '''n subroutines each called from n places, with the same value held in 198 locals around them'''
+    body = []
+    for i in range(2, 200):
+        body += ['    iload_0', '    istore {}'.format(i)]
+    for j in range(n):
+        for i in range(n):
+            body += ['    jsr S{}'.format(i), '    iinc {} 1'.format(2 + (i*7 + j) % 198)]
+    body += ['    iload 2', '    ireturn']
+    for i in range(n):
+        body += ['S{}:'.format(i), '    astore_1', '    iinc {} 1'.format(2 + i % 198), '    ret 1']
+    return _method('run', '(I)I', 200, 2, body)
+
+def constants(n):
+    '''A constant pool with n entries, filled by string constants spread over several methods'''
+    perMethod = 10000
+    strings = (n - 30) // 2 #each string takes a Utf8 and a String entry, plus a few for the class itself
+    lines = []
+    for start in range(0, strings, perMethod):
+        body = []
+        for i in range(start, min(start+perMethod, strings)):
+            body += ['    ldc_w "s{}"'.format(i), '    pop']
+        body += ['    return']
+        lines += _method('run{}'.format(start // perMethod), '()V', 0, 1, body)
+    return lines
+
+def codesize(n):
+    '''A method with roughly n bytes of bytecode, with a branch every few instructions'''
+    body = ['    iconst_0', '    istore_1']
+    for i in range(n // 14):
+        body += ['    iload_1', '    iload_0', '    iadd', '    istore_1', #4 bytes
+            '    iload_1', '    ifge L{}'.format(i), '    iinc 1 1', 'L{}:'.format(i), #7 bytes
+            '    iinc 0 -1'] #3 bytes
+    body += ['    iload_1', '    ireturn']
+    return _method('run', '(I)I', 2, 2, body)
+
+def deadlocals(n):
+    '''Like codesize, with roughly n bytes of branches, but with 198 extra locals which are never read'''
+    body = []
+    for i in range(2, 200):
+        body += ['    iload_0', '    istore {}'.format(i)]
+    body += ['    iconst_0', '    istore_1']
+    for i in range(n // 14):
+        body += ['    iload_1', '    iload_0', '    iadd', '    istore_1',
+            '    iload_1', '    ifge L{}'.format(i), '    iinc 1 1', 'L{}:'.format(i),
+            '    iinc 0 -1']
+    body += ['    iload_1', '    ireturn']
+    return _method('run', '(I)I', 200, 2, body)
+
+def bigtry(n):
+    '''A single try block around n instructions which may throw'''
+    body = ['    iconst_1', '    istore_1', 'LS:']
+    for i in range(n):
+        body += ['    iload_0', '    iload_0', '    idiv', '    pop']
+    body += ['LE:', '    iload_1', '    ireturn', 'LH:', '    pop', '    iconst_m1', '    ireturn',
+        '.catch java/lang/ArithmeticException from LS to LE using LH',
+        '.catch java/lang/Throwable from LS to LE using LH']
+    return _method('run', '(I)I', 2, 2, body)
+
+def opaque(n):
+    '''n always true predicates, each guarding dead code with a loop in it'''
+    body = ['    iconst_0', '    istore_1']
+    for i in range(n):
+        body += ['    iconst_3', '    iconst_3', '    imul', '    bipush 9', '    if_icmpeq K{}'.format(i),
+            '    iload_0', '    iload_1', '    idiv', '    istore_1',
+            'J{}:'.format(i), '    iinc 1 -1', '    iload_1', '    ifgt J{}'.format(i),
+            'K{}:'.format(i), '    iload_1', '    iload_0', '    iadd', '    istore_1']
+    body += ['    iload_1', '    ireturn']
+    return _method('run', '(I)I', 2, 2, body)
+
+#Each case with a range of sizes to measure by default
+cases = {
+    'tableswitch': (tableswitch, [100, 1000, 10000]),
+    'lookupswitch': (lookupswitch, [100, 1000, 10000]),
+    'loops': (loops, [5, 10, 20, 40]),
+    'handlers': (handlers, [100, 500, 1000, 2000]),
+    'jsrs': (jsrs, [2, 4, 6, 8]),
+    'widejsrs': (widejsrs, [5, 10, 20, 30]),
+    'constants': (constants, [1000, 10000, 60000]),
+    'codesize': (codesize, [1000, 8000, 32000, 65000]),
+    'deadlocals': (deadlocals, [1000, 4000, 16000]),
+    'bigtry': (bigtry, [100, 500, 1000]),
+    'opaque': (opaque, [50, 100, 400]),
+}
+
+def generate(case, size):
+    '''Returns the assembly source for the given case and size'''
+    name = 'Synth_{}_{}'.format(case, size)
+    lines = ['.class public {}'.format(name), '.super java/lang/Object', '']
+    lines += cases[case][0](size)
+    return name, '\n'.join(lines) + '\n'
+
+def measure(corpus, case, size):
+    name, source = generate(case, size)
+    start = time.time()
+    (_, data), = corpus.assemble(source)
+    result = {'case':case, 'size':size, 'bytes':len(data), 'assemble':time.time() - start}
+
+    start = time.time()
+    disassembler.disassemble(corpus.loadClass(data))
+    result['disassemble'] = time.time() - start
+
+    corpus.addClass(name, data)
+    start = time.time()
+    corpus.prepare([name])
+    result['decompile'] = time.time() - start
+    return result
+
+if __name__== "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Generate pathological classes and measure time against size')
+    parser.add_argument('-out', help='Write the generated classes to this directory instead of measuring them')
+    parser.add_argument('-size', type=int, action='append', help='Size to generate (default: a range of sizes per case)')
+    parser.add_argument('-save', help='Write the measurements to this file as JSON Lines')
+    parser.add_argument('cases', nargs='*', help='Cases to generate: ' + ', '.join(sorted(cases)), default=sorted(cases))
+    args = parser.parse_args()
+
+    if args.out and not os.path.isdir(args.out):
+        os.makedirs(args.out)
+    corpus = run.Corpus([], [])
+    try:
+        for case in args.cases:
+            for size in (args.size or cases[case][1]):
+                if args.out:
+                    name, source = generate(case, size)
+                    (_, data), = corpus.assemble(source)
+                    with open(os.path.join(args.out, name + '.class'), 'wb') as f:
+                        f.write(data)
+                    print 'Class written to', os.path.join(args.out, name + '.class')
+                    continue
+
+                result = measure(corpus, case, size)
+                print '{case:12} {size:6} {bytes:8} bytes  assemble {assemble:7.3f}s  disassemble {disassemble:7.3f}s  decompile {decompile:8.3f}s'.format(**result)
+                if args.save:
+                    with open(args.save, 'a') as f:
+                        f.write(json.dumps(result, sort_keys=True) + '\n')
+    finally:
+        corpus.close()
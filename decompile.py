@@ -1,12 +1,14 @@
 import os.path
-import time, random
+import time, random, json
 
 import Krakatau
 import Krakatau.ssa
 from Krakatau.environment import Environment
+from Krakatau.ssa import exceptionset
 from Krakatau.java import javaclass
+from Krakatau.java.sourcewriter import SourceWriter
 from Krakatau.verifier.inference_verifier import verifyBytecode
-from Krakatau import script_util
+from Krakatau import script_util, instrument
 
 def findJRE():
     try:
@@ -22,10 +24,21 @@ def findJRE():
     except Exception as e:
         pass
 
-def _stats(s):
+def _graphSize(s):
     bc = len(s.blocks)
     vc = sum(len(b.unaryConstraints) for b in s.blocks)
-    return '{} blocks, {} variables'.format(bc,vc)
+    return bc, vc
+
+def _stats(s):
+    return '{} blocks, {} variables'.format(*_graphSize(s))
+
+def _printSlowest(methods):
+    print 'Slowest methods:'
+    for info in methods:
+        sizes = ['{} {}'.format(info[k], k) for k in ('codelen', 'handlers', 'blocks', 'variables', 'nodes') if k in info]
+        phases = sorted(info['phases'].items(), key=lambda t:-t[1])[:3]
+        print '{:8.3f}s {} {}'.format(info['time'], info['class'], info['method'].encode('utf8'))
+        print '    {}; {}'.format(', '.join(sizes), ', '.join('{} {:.3f}s'.format(k, v) for k, v in phases))
 
 def _print(s):
     from Krakatau.ssa.printer import SSAPrinter
@@ -33,27 +46,26 @@ def _print(s):
 
 def makeCallback(funcs):
     def makeGraph(m):
-        v = verifyBytecode(m.code)
-        s = Krakatau.ssa.ssaFromVerified(m.code, v)
+        with instrument.phase('verifyBytecode'):
+            v = verifyBytecode(m.code)
+        with instrument.phase('ssaFromVerified'):
+            s = Krakatau.ssa.ssaFromVerified(m.code, v)
         for func in funcs:
             func(graph=s)
 
         if s.procs:
             # s.mergeSingleSuccessorBlocks()
             # s.removeUnusedVariables()
-            s.inlineSubprocs()
+            with instrument.phase('inlineSubprocs'):
+                s.inlineSubprocs()
 
         # print _stats(s)
-        s.condenseBlocks()
-        s.mergeSingleSuccessorBlocks()
-        s.removeUnusedVariables()
-        # print _stats(s)
-        s.constraintPropagation()
-        s.disconnectConstantVariables()
-        s.simplifyJumps()
-        s.mergeSingleSuccessorBlocks()
-        s.removeUnusedVariables()
+        s.runPasses(['propagateConstants', 'condenseBlocks', 'mergeSingleSuccessorBlocks', 'removeUnusedVariables',
+            'constraintPropagation', 'disconnectConstantVariables', 'simplifyJumps',
+            'mergeSingleSuccessorBlocks', 'removeUnusedVariables'])
         # print _stats(s)
+        blocks, variables = _graphSize(s)
+        instrument.note(blocks=blocks, variables=variables)
         return s
     return makeGraph
 
@@ -69,8 +81,13 @@ def deleteUnusued(cls):
     del cls.interfaces_raw, cls.cpool
     del cls.attributes
 
-def decompileClass(path=[], targets=None, outpath=None, plugins=[]):
+def decompileClass(path=[], targets=None, outpath=None, plugins=[], statspath=None, slowest=0, slowestpath=None):
     writeout = script_util.fileDirOut(outpath, '.java')
+    statsfile = open(statspath, 'w') if statspath is not None else None
+    showTotals = statsfile is not None or instrument.isProfiling()
+    recorder = None
+    if showTotals or slowest:
+        recorder = instrument.start(statsfile, slowest)
 
     e = Environment()
     for part in path:
@@ -82,18 +99,44 @@ def decompileClass(path=[], targets=None, outpath=None, plugins=[]):
     with e: #keep jars open
         for i,target in enumerate(targets):
             print 'processing target {}, {} remaining'.format(target, len(targets)-i)
-            c = e.getClass(target)
-            source = javaclass.generateAST(c, makeGraph).print_()
-            #The single class decompiler doesn't add package declaration currently so we add it here
-            if '/' in target:
-                package = 'package {};\n\n'.format(target.replace('/','.').rpartition('.')[0])
-                source = package + source
-
-            filename = writeout(c.name, source)
+            with instrument.scope('class', target):
+                with instrument.phase('parse'):
+                    c = e.getClass(target)
+                class_ast = javaclass.generateAST(c, makeGraph)
+                #The single class decompiler doesn't add package declaration currently so we add it here
+                package = ''
+                if '/' in target:
+                    package = 'package {};\n\n'.format(target.replace('/','.').rpartition('.')[0])
+
+                def writeSource(f):
+                    f.write(package)
+                    out = SourceWriter(f)
+                    class_ast.write(out)
+                    out.finish()
+                with instrument.phase('print'):
+                    filename = writeout(c.name, writeSource)
             print 'Class written to', filename
             print time.time() - start_time, ' seconds elapsed'
             deleteUnusued(c)
 
+    if statsfile is not None:
+        hits, misses, count = exceptionset.cacheStats(e)
+        rate = float(hits)/(hits+misses) if hits or misses else 0.0
+        print 'ExceptionSet cache: {} hits, {} misses ({:.1%} hit rate), {} interned sets'.format(hits, misses, rate, count)
+    if recorder is not None:
+        instrument.stop()
+        if showTotals and recorder.phaseTotals:
+            totals = sorted(recorder.phaseTotals.items(), key=lambda t:-t[1])
+            print 'Phase times:', ', '.join('{} {:.3f}s'.format(k, v) for k, v in totals)
+        if statsfile is not None:
+            statsfile.close()
+            print 'Phase statistics written to', statspath
+        if recorder.heap:
+            _printSlowest(recorder.slowestMethods())
+            if slowestpath is not None:
+                with open(slowestpath, 'w') as f:
+                    json.dump(recorder.slowestMethods(), f, indent=1)
+
 if __name__== "__main__":
     print script_util.copyright
 
@@ -104,8 +147,17 @@ if __name__== "__main__":
     parser.add_argument('-out',help='Path to generate source files in')
     parser.add_argument('-nauto', action='store_true', help="Don't attempt to automatically locate the Java standard library. If enabled, you must specify the path explicitly.")
     parser.add_argument('-r', action='store_true', help="Process all files in the directory target and subdirectories")
+    parser.add_argument('-stats', help='Record the time and memory used by each phase of decompilation to this file, as JSON Lines')
+    parser.add_argument('-slowest', type=int, default=0, help='Number of slowest methods to report at exit (default: none)')
+    parser.add_argument('-slowestout', help='Also write the slowest methods report to this file, as JSON')
+    parser.add_argument('-profile', help='Profile the run with cProfile and write the stats to this file')
+    parser.add_argument('-profilemin', type=int, help='Only profile methods with at least this many bytes of bytecode (requires -profile)')
+    parser.add_argument('-timelimit', type=float, help='Replace methods which take longer than this many seconds to decompile with stubs')
+    parser.add_argument('-memlimit', type=int, help='Replace methods which grow peak memory use by more than this many megabytes with stubs')
     parser.add_argument('target',help='Name of class or jar file to decompile')
     args = parser.parse_args()
+    if args.profilemin is not None and not args.profile:
+        parser.error('-profilemin requires -profile')
 
     plugins = []
     if args.plugin is not None:
@@ -132,4 +184,10 @@ if __name__== "__main__":
 
     targets = script_util.findFiles(args.target, args.r, '.class')
     targets = map(script_util.normalizeClassname, targets)
-    decompileClass(path, targets, args.out, plugins)
\ No newline at end of file
+    if args.profile:
+        instrument.startProfiling(args.profilemin)
+    instrument.setBudget(args.timelimit, None if args.memlimit is None else args.memlimit * 1024)
+    decompileClass(path, targets, args.out, plugins, args.stats, args.slowest, args.slowestout)
+    if args.profile:
+        instrument.stopProfiling(args.profile)
+        print 'Profile written to', args.profile
\ No newline at end of file
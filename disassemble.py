@@ -6,7 +6,7 @@ import Krakatau.binUnpacker
 from Krakatau.classfile import ClassFile
 import Krakatau.assembler.disassembler
 
-from Krakatau import script_util
+from Krakatau import script_util, instrument
 
 def readFile(filename):
     with open(filename, 'rb') as f:
@@ -39,8 +39,12 @@ if __name__== "__main__":
     parser.add_argument('-out',help='Path to generate files in')
     parser.add_argument('-r', action='store_true', help="Process all files in the directory target and subdirectories")
     parser.add_argument('-path',help='Jar to look for class in')
+    parser.add_argument('-profile', help='Profile the run with cProfile and write the stats to this file')
+    parser.add_argument('-profilemin', type=int, help='Only profile methods with at least this many bytes of bytecode (requires -profile)')
     parser.add_argument('target',help='Name of class or jar file to decompile')
     args = parser.parse_args()
+    if args.profilemin is not None and not args.profile:
+        parser.error('-profilemin requires -profile')
 
     targets = script_util.findFiles(args.target, args.r, '.class')
 
@@ -57,4 +61,9 @@ if __name__== "__main__":
     else:
         readTarget = readFile
 
-    disassembleClass(readTarget, targets, args.out)
\ No newline at end of file
+    if args.profile:
+        instrument.startProfiling(args.profilemin)
+    disassembleClass(readTarget, targets, args.out)
+    if args.profile:
+        instrument.stopProfiling(args.profile)
+        print 'Profile written to', args.profile
\ No newline at end of file
@@ -0,0 +1,155 @@
+import unittest
+
+from Krakatau.ssa import variablegraph
+from Krakatau.ssa.constraints import IntConstraint, widen
+from Krakatau.ssa.ssa_ops.imath import getNewRange
+from Krakatau.ssa.ssa_types import SSA_INT
+
+BOT = IntConstraint.bot(32)
+MIN, MAX = BOT.min, BOT.max
+
+def r(a, b):
+    return IntConstraint(32, a, b)
+
+class Var(object):
+    def __init__(self, const=None):
+        self.const = const
+        self.type = SSA_INT
+
+def lessThan(x, y):
+    #the constraints on the true branch of x < y
+    x2, y1 = min(x.max, y.max-1), max(x.min+1, y.min)
+    return IntConstraint.range(32, x.min, x2), IntConstraint.range(32, y1, y.max)
+
+def notEqual(x, y):
+    #the constraints on the true branch of x != y, for a constant y
+    x1 = x.min+1 if x.min == y.min else x.min
+    x2 = x.max-1 if x.max == y.max else x.max
+    return IntConstraint.range(32, x1, x2), y
+
+def countedLoop(bound, compare=lessThan):
+    '''Builds the graph for i = 0; while (compare(i, bound)) i = i + 1; the way makeGraph would. Returns
+    the graph and the variables for i at the loop header, in the body, and after the increment'''
+    graph = {}
+    def varNode(var, source=None):
+        node = variablegraph.BaseNode(lambda *x:x, False)
+        if source is None:
+            node.output = node.upOutput = (BOT if var.const is None else IntConstraint.const(32, var.const),)
+        else:
+            node.sources = [source]
+            source[0].uses.append(node)
+            node.output, node.upOutput = (BOT,), (None,)
+        graph[var] = node
+        return node
+    def opNode(func, isphi, *sources):
+        node = variablegraph.BaseNode(func, isphi)
+        node.sources = [(n, 0) for n in sources]
+        variablegraph.registerUses(node, node.sources)
+        node.output = (BOT,) if isphi else (BOT,)*len(sources)
+        node.upOutput = (None,)*len(node.output)
+        return node
+
+    zero, one = varNode(Var(0)), varNode(Var(1))
+    limit = varNode(bound)
+    phi = opNode(lambda *x:[variablegraph.meet(*x) if x else None], True, zero)
+    head, body, inc = Var(), Var(), Var()
+    headNode = varNode(head, (phi, 0))
+    jump = opNode(compare, False, headNode, limit)
+    bodyNode = varNode(body, (jump, 0))
+    add = opNode(lambda x, y:getNewRange(32, x.min+y.min, x.max+y.max), False, bodyNode, one)
+    add.output, add.upOutput = (BOT, None, None), (None, None, None)
+    incNode = varNode(inc, (add, 0))
+    phi.sources.append((incNode, 0))
+    incNode.uses.append(phi)
+    return graph, head, body, inc
+
+class TestWiden(unittest.TestCase):
+    def test_thresholds(self):
+        thresholds = (-100, -5, 9, 10, 11)
+        #Growing bounds stop at the next threshold out, or at one short of the type bound past them
+        self.assertEqual(r(0, 0).widen(r(0, 1), thresholds), r(0, 9))
+        self.assertEqual(r(0, 9).widen(r(0, 10), thresholds), r(0, 10))
+        self.assertEqual(r(0, 10).widen(r(0, 11), thresholds), r(0, 11))
+        self.assertEqual(r(0, 11).widen(r(0, 12), thresholds), r(0, MAX-1))
+        self.assertEqual(r(0, 0).widen(r(-1, 0), thresholds), r(-5, 0))
+        self.assertEqual(r(-5, 0).widen(r(-6, 0), thresholds), r(-100, 0))
+        self.assertEqual(r(-100, 0).widen(r(-101, 0), thresholds), r(MIN+1, 0))
+        #Bounds which don't grow are left alone, even if new is smaller
+        self.assertEqual(r(-3, 3).widen(r(0, 4), thresholds), r(-3, 9))
+        self.assertEqual(r(-3, 3).widen(r(-1, 1), thresholds), r(-3, 3))
+
+    def test_type_bound(self):
+        #Stop one short of the type bound first, unless it has already been reached
+        self.assertEqual(r(0, 0).widen(r(0, 1)), r(0, MAX-1))
+        self.assertEqual(r(0, 0).widen(r(0, 1), (MAX,)), r(0, MAX-1))
+        self.assertEqual(r(0, MAX-1).widen(r(0, MAX)), r(0, MAX))
+        self.assertEqual(r(0, 0).widen(r(0, MAX)), r(0, MAX))
+        self.assertEqual(r(0, 0).widen(r(-1, 0)), r(MIN+1, 0))
+        self.assertEqual(r(MIN+1, 0).widen(r(MIN, 0)), r(MIN, 0))
+        self.assertEqual(widen(r(0, 0), None), None)
+        self.assertEqual(widen(None, r(0, 1)), r(0, 1))
+
+class TestVariableGraph(unittest.TestCase):
+    def phiNode(self, upIters, old, new):
+        source = variablegraph.BaseNode(lambda *x:x, False)
+        source.output, source.upOutput = (BOT,), (new,)
+        phi = variablegraph.BaseNode(lambda *x:[variablegraph.meet(*x)], True)
+        phi.sources = [(source, 0)]
+        phi.output, phi.upOutput = (BOT,), (old,)
+        phi.upIters = upIters
+        return phi
+
+    def test_widening_delay(self):
+        phi = self.phiNode(variablegraph.WIDEN_DELAY - 1, r(0, 0), r(0, 1))
+        self.assertTrue(phi.update(5, (9,)))
+        self.assertEqual(phi.upOutput, (r(0, 1),))
+        self.assertFalse(phi.widened)
+
+        phi = self.phiNode(variablegraph.WIDEN_DELAY, r(0, 0), r(0, 1))
+        self.assertTrue(phi.update(5, (9,)))
+        self.assertEqual(phi.upOutput, (r(0, 9),))
+        self.assertTrue(phi.widened)
+
+    def test_last_iteration_skips_thresholds(self):
+        phi = self.phiNode(3, r(0, 0), r(0, 1))
+        phi.update(5, (9,))
+        self.assertEqual(phi.upOutput, (r(0, 9),))
+
+        phi = self.phiNode(4, r(0, 0), r(0, 1))
+        phi.update(5, (9,))
+        self.assertEqual(phi.upOutput, (r(0, MAX-1),))
+
+        #Widening isn't applied to phis that aren't widening points
+        phi = self.phiNode(4, r(0, 0), r(0, 1))
+        phi.widenPoint = False
+        phi.update(5, (9,))
+        self.assertEqual(phi.upOutput, (r(0, 1),))
+
+    def test_counted_loop(self):
+        graph, head, body, inc = countedLoop(Var(10))
+        variablegraph.processGraph(graph)
+        self.assertEqual(graph[head].output, (r(0, 10),))
+        self.assertEqual(graph[body].output, (r(0, 9),))
+        self.assertEqual(graph[inc].output, (r(1, 10),))
+
+    def test_counted_loop_thresholds(self):
+        #With i != 10, neither the pessimistic bounds nor narrowing can recover the upper bound once it
+        #has been widened past 10, so this relies on widening stopping at the thresholds. The thresholds
+        #around the increment are passed first, so it takes more than the default number of iterations
+        graph, head, body, inc = countedLoop(Var(10), notEqual)
+        self.assertEqual(variablegraph.getThresholds(graph), (-1, 0, 1, 2, 9, 10, 11))
+        variablegraph.processGraph(graph, 8)
+        self.assertEqual(graph[head].output, (r(0, 10),))
+        self.assertEqual(graph[body].output, (r(0, 9),))
+        self.assertEqual(graph[inc].output, (r(1, 10),))
+
+    def test_counted_loop_unknown_bound(self):
+        #Against an unknown bound, the counter can still be shown not to overflow
+        graph, head, body, inc = countedLoop(Var())
+        variablegraph.processGraph(graph)
+        self.assertEqual(graph[head].output, (r(0, MAX),))
+        self.assertEqual(graph[body].output, (r(0, MAX-1),))
+        self.assertEqual(graph[inc].output, (r(1, MAX),))
+
+if __name__ == '__main__':
+    unittest.main()
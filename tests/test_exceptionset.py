@@ -0,0 +1,27 @@
+import gc, unittest, weakref
+
+from Krakatau.environment import Environment
+from Krakatau.ssa.exceptionset import ExceptionSet, cacheStats
+
+class TestSetCache(unittest.TestCase):
+    def test_interned(self):
+        env = Environment()
+        a = ExceptionSet.fromTops(env, 'java/lang/Throwable')
+        b = ExceptionSet.fromTops(env, 'java/lang/Throwable')
+        self.assertIs(a, b)
+        self.assertEqual(cacheStats(env)[2], 1)
+        self.assertEqual(cacheStats(Environment()), (0, 0, 0))
+
+    def test_environment_collected(self):
+        #The interned sets refer back to their environment, which mustn't keep it alive
+        refs = []
+        for _ in range(3):
+            env = Environment()
+            ExceptionSet.fromTops(env, 'java/lang/Throwable')
+            refs.append(weakref.ref(env))
+            del env
+        gc.collect()
+        self.assertEqual([r() for r in refs], [None]*3)
+
+if __name__ == '__main__':
+    unittest.main()
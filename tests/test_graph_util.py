@@ -0,0 +1,287 @@
+import itertools, random, unittest
+
+from Krakatau import graph_util
+from Krakatau.java.structuring import DominatorInfo
+
+#Reference versions of the algorithms, as they were before IndexedGraph, working directly on the nodes
+def refTarjanSCC(roots, getChildren):
+    sccs = []
+    indexCounter = itertools.count()
+    index = {}
+    lowlink = {}
+    removed = set()
+    subtree = []
+
+    stack = [(node,0) for node in roots]
+    while stack:
+        current, state = stack.pop()
+        if state == 0:
+            if current not in index:
+                lowlink[current] = index[current] = next(indexCounter)
+                children = [child for child in getChildren(current) if child not in removed]
+                subtree.append(current)
+                stack.append((current,1))
+                stack.extend((child,0) for child in children)
+        else:
+            children = [child for child in getChildren(current) if child not in removed]
+            for child in children:
+                if index[child] <= index[current]:
+                    lowlink[current] = min(lowlink[current], index[child])
+                else:
+                    lowlink[current] = min(lowlink[current], lowlink[child])
+
+            if index[current] == lowlink[current]:
+                scc = []
+                while not scc or scc[-1] != current:
+                    scc.append(subtree.pop())
+                sccs.append(tuple(scc))
+                removed.update(scc)
+    return sccs
+
+def refDominators(root, getChildren):
+    preds = {root:[]}
+    rpo = []
+    stack = [(root, iter(getChildren(root)))]
+    while stack:
+        cur, children = stack[-1]
+        for child in children:
+            if child not in preds:
+                preds[child] = [cur]
+                stack.append((child, iter(getChildren(child))))
+                break
+            preds[child].append(cur)
+        else:
+            stack.pop()
+            rpo.append(cur)
+    rpo.reverse()
+
+    rpo_num = {n:i for i,n in enumerate(rpo)}
+    idom = {root:root}
+    def intersect(a, b):
+        while a != b:
+            while rpo_num[a] > rpo_num[b]:
+                a = idom[a]
+            while rpo_num[b] > rpo_num[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for n in rpo[1:]:
+            new = None
+            for p in preds[n]:
+                if p in idom:
+                    new = p if new is None else intersect(p, new)
+            if idom.get(n) != new:
+                idom[n] = new
+                changed = True
+    return idom
+
+def reaches(edges, start, goals, banned=None):
+    seen, stack = set(), [start]
+    while stack:
+        x = stack.pop()
+        if x in seen or x == banned:
+            continue
+        if x in goals:
+            return True
+        seen.add(x)
+        stack.extend(edges[x])
+    return False
+
+def refReducible(root, edges):
+    #A graph is reducible iff it can be collapsed to a single node by removing self loops and merging
+    #each node other than the root which has a unique predecessor into it
+    succs = {x:set(children) - {x} for x, children in edges.items()}
+    preds = {x:set() for x in succs}
+    for x, children in succs.items():
+        for child in children:
+            preds[child].add(x)
+    changed = True
+    while changed:
+        changed = False
+        for x in list(succs):
+            if x != root and len(preds[x]) == 1:
+                p, = preds[x]
+                for child in succs.pop(x):
+                    preds[child].discard(x)
+                    if child != p:
+                        preds[child].add(p)
+                        succs[p].add(child)
+                succs[p].discard(x)
+                del preds[x]
+                changed = True
+    return len(succs) == 1
+
+def randomGraph(rand, maxsize=40, maxdegree=4):
+    n = rand.randrange(1, maxsize)
+    return {i:[rand.randrange(n) for _ in range(rand.randrange(maxdegree))] for i in range(n)}
+
+class Node(object):
+    def __init__(self):
+        self.successors = []
+
+class TestIndexedGraph(unittest.TestCase):
+    def test_sccs_match_reference(self):
+        rand = random.Random(0)
+        for _ in range(500):
+            edges = randomGraph(rand)
+            roots = [rand.randrange(len(edges)) for _ in range(rand.randrange(1, 4))]
+            self.assertEqual(graph_util.tarjanSCC(roots, edges.get), refTarjanSCC(roots, edges.get))
+
+    def test_dominators_match_reference(self):
+        rand = random.Random(1)
+        for _ in range(500):
+            edges = randomGraph(rand)
+            graph = graph_util.IndexedGraph([0], edges.get)
+            idom = {graph.nodes[x]:graph.nodes[d] for x, d in enumerate(graph.dominators())}
+            self.assertEqual(idom, refDominators(0, edges.get))
+
+            #Also check DominatorInfo, which is built on top of it
+            nodes = [Node() for _ in edges]
+            for i, node in enumerate(nodes):
+                node.successors = [nodes[j] for j in edges[i]]
+            dom = DominatorInfo(nodes[0])
+            ref = refDominators(nodes[0], lambda node:node.successors)
+            for node in ref:
+                path = [node]
+                while path[-1] is not nodes[0]:
+                    path.append(ref[path[-1]])
+                self.assertEqual(dom.dominators(node), tuple(reversed(path)))
+                for other in ref:
+                    self.assertEqual(dom.dominates(other, node), other in path)
+
+    def test_post_dominators(self):
+        rand = random.Random(2)
+        for _ in range(300):
+            edges = randomGraph(rand, 25, 3)
+            graph = graph_util.IndexedGraph([0], edges.get)
+            ipdom = graph.postDominators()
+            exits = set(x for x in graph.nodes if not edges[x])
+            for i, x in enumerate(graph.nodes):
+                expected = None
+                if reaches(edges, x, exits):
+                    #y post dominates x if x can't reach an exit without going through y
+                    pdoms = [y for y in graph.nodes if y != x and not reaches(edges, x, exits, y)]
+                    for y in pdoms:
+                        if all(z == y or not reaches(edges, y, exits, z) for z in pdoms):
+                            expected = y
+                got = None if ipdom[i] is None else graph.nodes[ipdom[i]]
+                self.assertEqual(got, expected)
+
+    def test_loop_forest(self):
+        rand = random.Random(3)
+        for _ in range(500):
+            edges = randomGraph(rand)
+            graph = graph_util.IndexedGraph([0], edges.get)
+            headers, parent = graph.loopForest()
+            self.assertEqual(len(set(headers)), len(headers))
+
+            bodies = {h:{h} for h in headers}
+            for x in range(len(graph.nodes)):
+                h = parent[x]
+                while h is not None:
+                    bodies[h].add(x)
+                    h = parent[h]
+            for h in headers:
+                #Each loop is strongly connected, with an edge back to its header
+                inner = {graph.nodes[x] for x in bodies[h]}
+                sub = {k:[c for c in edges[k] if c in inner] for k in inner}
+                head = graph.nodes[h]
+                self.assertTrue(any(head in sub[k] for k in inner))
+                for x in inner:
+                    self.assertTrue(x == head or reaches(sub, head, {x}) and reaches(sub, x, {head}))
+            #Every cycle passes through a header, so removing them leaves an acyclic graph
+            rest = set(graph.nodes) - {graph.nodes[h] for h in headers}
+            acyclic = {k:[c for c in edges[k] if c in rest] for k in rest}
+            for scc in refTarjanSCC(list(rest), acyclic.get):
+                self.assertEqual(len(scc), 1)
+                self.assertNotIn(scc[0], acyclic[scc[0]])
+
+    def test_reducible(self):
+        #2 and 3 are entered from 1, and 3 and 1 from 4, so the loops have multiple entries
+        irreducible = {0:[1], 1:[2, 3], 2:[3, 4], 3:[4], 4:[1, 3]}
+        reducible = {0:[1], 1:[2, 5], 2:[3, 4], 3:[4], 4:[1, 2], 5:[]}
+        for edges, expected in [(irreducible, False), (reducible, True)]:
+            self.assertEqual(refReducible(0, edges), expected)
+            #The result mustn't depend on the order the successors are visited in
+            for orders in itertools.product(*[list(itertools.permutations(edges[x])) for x in sorted(edges)]):
+                permuted = dict(zip(sorted(edges), orders))
+                graph = graph_util.IndexedGraph([0], permuted.get)
+                self.assertEqual(graph.isReducible(), expected)
+
+    def test_reducible_matches_reference(self):
+        rand = random.Random(4)
+        counts = [0, 0]
+        for _ in range(1000):
+            edges = randomGraph(rand, 15, 4)
+            graph = graph_util.IndexedGraph([0], edges.get)
+            reachable = {x:edges[x] for x in graph.nodes}
+            expected = refReducible(0, reachable)
+            self.assertEqual(graph.isReducible(), expected)
+            counts[expected] += 1
+        self.assertTrue(min(counts) > 50)
+
+    def test_nested_natural_loops(self):
+        #For a graph of nested natural loops, the headers are the targets of the back edges
+        edges = {0:[1], 1:[2, 6], 2:[3], 3:[3, 4], 4:[2, 5], 5:[1], 6:[]}
+        graph = graph_util.IndexedGraph([0], edges.get)
+        headers, parent = graph.loopForest()
+        nodes = graph.nodes
+        self.assertEqual([nodes[h] for h in headers], [1, 2, 3])
+        named = {nodes[x]:(None if p is None else nodes[p]) for x, p in enumerate(parent)}
+        self.assertEqual(named, {0:None, 1:None, 2:1, 3:2, 4:2, 5:1, 6:None})
+
+    def test_loop_forest_many_loops(self):
+        #Loops one after another, and nested inside each other
+        k = 500
+        edges = {}
+        for i in range(k):
+            edges[2*i] = [2*i+1]
+            edges[2*i+1] = [2*i, 2*i+2]
+        edges[2*k] = []
+        graph = graph_util.IndexedGraph([0], edges.get)
+        headers, parent = graph.loopForest()
+        nodes = graph.nodes
+        self.assertEqual(sorted(nodes[h] for h in headers), range(0, 2*k, 2))
+        for x, p in enumerate(parent):
+            self.assertEqual(None if p is None else nodes[p], nodes[x]-1 if nodes[x] % 2 else None)
+
+        edges = {i:[i+1] for i in range(2*k+1)}
+        edges[2*k+1] = []
+        for j in range(1, k+1):
+            edges[k+j].append(k+1-j) #the end of the jth innermost loop jumps back to its header
+        graph = graph_util.IndexedGraph([0], edges.get)
+        headers, parent = graph.loopForest()
+        nodes = graph.nodes
+        self.assertEqual([nodes[h] for h in headers], range(1, k+1))
+        for x, p in enumerate(parent):
+            x = nodes[x]
+            expected = None if x in (0, 1, 2*k+1) else (x-1 if x <= k else 2*k+1-x)
+            self.assertEqual(None if p is None else nodes[p], expected)
+
+class TestFindRoot(unittest.TestCase):
+    def test_compresses_chain(self):
+        parents = {1:2, 2:3, 3:4, 4:5}
+        self.assertEqual(graph_util.findRoot(parents, 1), 5)
+        self.assertEqual(parents, {1:5, 2:5, 3:5, 4:5})
+        self.assertEqual(graph_util.findRoot(parents, 5), 5)
+        self.assertEqual(graph_util.findRoot(parents, 6), 6)
+
+    def test_compresses_path_only(self):
+        #Only the nodes on the path from the node looked up are changed
+        parents = {1:2, 2:3, 3:4, 4:5, 6:3, 7:6}
+        self.assertEqual(graph_util.findRoot(parents, 2), 5)
+        self.assertEqual(parents, {1:2, 2:5, 3:5, 4:5, 6:3, 7:6})
+        self.assertEqual(graph_util.findRoot(parents, 7), 5)
+        self.assertEqual(parents, {1:2, 2:5, 3:5, 4:5, 6:5, 7:5})
+
+    def test_long_chain(self):
+        n = 10000
+        parents = {i:i+1 for i in range(n)}
+        self.assertEqual(graph_util.findRoot(parents, 0), n)
+        self.assertTrue(all(p == n for p in parents.values()))
+
+if __name__ == '__main__':
+    unittest.main()